@@ -0,0 +1,56 @@
+"""
+common/bench_volatility.py
+
+(c) 2017 Marshall Farrier
+license http://opensource.org/licenses/MIT
+
+Compare per-call latency of DataFrame and NumPy volatility paths
+
+Usage
+-----
+python bench_volatility.py -n 252
+"""
+
+from argparse import ArgumentParser
+import timeit
+
+import numpy as np
+import pandas as pd
+
+import volatility
+
+
+def run(n_sessions, repeat=5, number=1000):
+    index = pd.date_range('2010-01-01', periods=n_sessions, freq='B')
+    prices = 100. * np.cumprod(1. + .01 * np.random.RandomState(0).randn(n_sessions))
+    eqdata = pd.DataFrame({'Adj Close': prices}, index=index)
+    out = np.empty(n_sessions - 1)
+    cases = [
+            ('DataFrame growth', lambda: volatility._get_daily(
+                _legacy_growth_data(eqdata, 'Adj Close'))),
+            ('get_daily(DataFrame)', lambda: volatility.get_daily(eqdata)),
+            ('daily_stats(prices)', lambda: volatility.daily_stats(prices)),
+            ('daily_stats(prices, out)', lambda: volatility.daily_stats(prices, out)),
+            ]
+    print('{} sessions, best of {} x {} calls'.format(n_sessions, repeat, number))
+    for name, fn in cases:
+        best = min(timeit.repeat(fn, repeat=repeat, number=number)) / number
+        print('{:<28} {:8.2f} us'.format(name, best * 1e6))
+
+def _legacy_growth_data(eqdata, selection):
+    # previous implementation of `volatility._get_growth_data()`
+    growthdata = pd.DataFrame(index=eqdata.index[1:],
+            columns=['Growth'], dtype=np.float64)
+    growthdata.loc[:, 'Growth'] = (eqdata.loc[:, selection].values[1:] /
+            eqdata.loc[:, selection].values[:-1])
+    return growthdata
+
+def _get_cli_args():
+    parser = ArgumentParser()
+    parser.add_argument('-n', '--sessions', type=int, default=252)
+    return vars(parser.parse_args())
+
+
+if __name__ == '__main__':
+    kwargs = _get_cli_args()
+    run(kwargs['sessions'])
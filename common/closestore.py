@@ -0,0 +1,170 @@
+"""
+common/closestore.py
+
+(c) 2017 Marshall Farrier
+license http://opensource.org/licenses/MIT
+
+Memory-mapped closing prices for a universe of equities
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+
+class CloseStore(object):
+    """
+    Closing prices for many equities on a shared date index, stored
+    as a single memory-mapped float64 matrix.
+
+    The matrix is stored in column-major order, so the prices for
+    each equity are contiguous and `get()` returns a view without
+    copying or reading the other equities. Missing prices are NaN.
+
+    Usage
+    -----
+    closes = CloseStore.build('~/.mfstockmkt/closes', store, equities, '2000', '2017')
+    ...
+    closes = CloseStore('~/.mfstockmkt/closes')
+    dates, prices = closes.valid('AAPL')
+    """
+    def __init__(self, root, mode='r'):
+        """
+        Parameters
+        ----------
+        root : str
+            Directory containing the store.
+
+        mode : str, optional
+            'r' for read-only access or 'r+' to allow
+            updates with `set()`. Defaults to 'r'.
+        """
+        self.root = os.path.expanduser(root)
+        self.dates = pd.DatetimeIndex(np.load(os.path.join(self.root, 'dates.npy'))
+                .view('datetime64[ns]'))
+        self.tickers = np.load(os.path.join(self.root, 'tickers.npy')).tolist()
+        self._columns = {ticker: i for i, ticker in enumerate(self.tickers)}
+        self._closes = np.load(os.path.join(self.root, 'closes.npy'), mmap_mode=mode)
+
+    @classmethod
+    def create(cls, root, dates, tickers):
+        """
+        Create an empty store and return it opened for updates.
+
+        Parameters
+        ----------
+        root : str
+
+        dates : DatetimeIndex
+            Shared date index.
+
+        tickers : list of str
+        """
+        root = os.path.expanduser(root)
+        os.makedirs(root, exist_ok=True)
+        dates = pd.DatetimeIndex(dates)
+        np.save(os.path.join(root, 'dates.npy'), dates.values.astype('datetime64[ns]').view('int64'))
+        np.save(os.path.join(root, 'tickers.npy'), np.array([str(ticker) for ticker in tickers]))
+        closes = np.lib.format.open_memmap(os.path.join(root, 'closes.npy'), mode='w+',
+                dtype='float64', shape=(dates.shape[0], len(tickers)), fortran_order=True)
+        closes[:] = np.nan
+        closes.flush()
+        del closes
+        return cls(root, mode='r+')
+
+    @classmethod
+    def build(cls, root, source, tickers, start, end=None, selection='Adj Close', dates=None):
+        """
+        Create a store from price history.
+
+        Only one equity's price history is held in memory at a time.
+        Unless `dates` is given, the history for each equity is
+        retrieved twice: first to find the shared date index, then
+        to write its prices.
+
+        Parameters
+        ----------
+        root : str
+
+        source : PriceStore
+            Object with a method `get(equity, start, end)` returning
+            price history, such as a `pricestore.PriceStore`.
+
+        tickers : list of str
+
+        start : Timestamp
+
+        end : Timestamp, optional
+
+        selection : str, optional
+            Price column. Defaults to 'Adj Close'.
+
+        dates : DatetimeIndex, optional
+            Shared date index, such as the trading sessions from `start`
+            through `end`. Prices on other dates are ignored. Defaults to
+            the union of the dates for all equities.
+        """
+        if dates is None:
+            dates = pd.DatetimeIndex([])
+            for ticker in tickers:
+                dates = dates.union(source.get(ticker, start, end).index)
+        store = cls.create(root, dates, tickers)
+        for ticker in tickers:
+            store.set(ticker, source.get(ticker, start, end).loc[:, selection])
+        store.flush()
+        return store
+
+    def get(self, ticker):
+        """
+        Return prices for `ticker` on all dates of the
+        shared index as a view, which is writable only if
+        the store was opened with mode 'r+'.
+        """
+        return self._closes[:, self._columns[ticker]]
+
+    def valid(self, ticker):
+        """
+        Return the dates and a view of the prices for `ticker` from its
+        first through its last available price.
+
+        Returns
+        -------
+        dates : DatetimeIndex
+
+        prices : ndarray
+        """
+        prices = self.get(ticker)
+        available = np.flatnonzero(~np.isnan(prices))
+        if available.shape[0] == 0:
+            return self.dates[:0], prices[:0]
+        begin = available[0]
+        end = available[-1] + 1
+        return self.dates[begin:end], prices[begin:end]
+
+    def frame(self, tickers=None):
+        """
+        Return prices as a (dates x tickers) DataFrame, as expected
+        by `velo.panel_vel()`.
+        """
+        if tickers is None:
+            return pd.DataFrame(self._closes, index=self.dates, columns=self.tickers, copy=False)
+        columns = [self._columns[ticker] for ticker in tickers]
+        return pd.DataFrame(self._closes[:, columns], index=self.dates, columns=tickers)
+
+    def set(self, ticker, closes):
+        """
+        Write prices for `ticker`, aligning `closes` on the
+        shared date index.
+
+        Parameters
+        ----------
+        ticker : str
+
+        closes : Series
+            Prices indexed by date.
+        """
+        self._closes[:, self._columns[ticker]] = closes.reindex(self.dates).values
+
+    def flush(self):
+        self._closes.flush()
@@ -7,6 +7,7 @@ license http://opensource.org/licenses/MIT
 Calculate performance metrics
 """
 
+import numpy as np
 import pandas as pd
 import pynance as pn
 
@@ -30,6 +31,10 @@ def fromeq(equity, **kwargs):
     selection : str, optional
         Column to use for price. Defaults to 'Adj Close'.
 
+    store : PriceStore, optional
+        Source of price history, such as a `pricestore.PriceStore`.
+        Defaults to retrieving data remotely with `pn.data.get`.
+
     Usage
     -----
     growth = perf.growth('AAPL', yrs=3, end='2014-12-01')
@@ -38,18 +43,26 @@ def fromeq(equity, **kwargs):
     offset = pd.tseries.offsets.DateOffset(months=12)
     end = pd.Timestamp(kwargs.get('end', pd.to_datetime('now')))
     start = pd.Timestamp(end - yrs * offset)
-    eqdata = pn.data.get(equity, start, end)
+    store = kwargs.pop('store', None)
+    if store is None:
+        eqdata = pn.data.get(equity, start, end)
+    else:
+        eqdata = store.get(equity, start, end)
     kwargs['equity'] = equity
     return fromdata(eqdata, **kwargs)
 
 def fromdata(eqdata, **kwargs):
     """
-    Get performance metrics from a DataFrame
+    Get performance metrics from a DataFrame or array of prices
 
     Parameters
     ----------
-    eqdata : pd.DataFrame
-        Source data.
+    eqdata : pd.DataFrame or np.ndarray
+        Source data. An array of prices, such as a view returned
+        by `closestore.CloseStore.valid()`, requires `index`.
+
+    index : pd.DatetimeIndex, optional
+        Dates for `eqdata` if it is an array.
 
     selection : str, optional
         Price column. Defaults to 'Adj Close'
@@ -68,11 +81,180 @@ def fromdata(eqdata, **kwargs):
             'Growth', 'Yrly Growth']
     metrics = pd.Series(index=index)
     metrics['Equity'] = equity
-    metrics['Start'] = eqdata.index[0]
-    metrics['End'] = eqdata.index[-1]
+    if isinstance(eqdata, np.ndarray):
+        index = kwargs['index']
+        prices = eqdata
+    else:
+        index = eqdata.index
+        prices = eqdata.loc[:, selection].values
+    metrics['Start'] = index[0]
+    metrics['End'] = index[-1]
     metrics['Years'] = (metrics['End'] - metrics['Start']).days / 365.25
-    metrics['Start Price'] = eqdata.iloc[0, :].loc[selection]
-    metrics['End Price'] = eqdata.iloc[-1, :].loc[selection]
+    metrics['Start Price'] = prices[0]
+    metrics['End Price'] = prices[-1]
     metrics['Growth'] = metrics['End Price'] / metrics['Start Price']
     metrics['Yrly Growth'] = pn.interest.yrlygrowth(metrics['Growth'], metrics['Years'])
     return metrics
+
+def rolling(eqdata, **kwargs):
+    """
+    Get growth metrics for every end date in a series.
+
+    Each start date is located by binary search in the date index,
+    so the whole series is processed at once instead of re-slicing
+    for every end date.
+
+    Parameters
+    ----------
+    eqdata : pd.DataFrame or np.ndarray
+        Source data. An array of prices requires `index`.
+
+    index : pd.DatetimeIndex, optional
+        Dates for `eqdata` if it is an array.
+
+    yrs : int, optional
+        Period over which to calculate performance.
+        Defaults to 1.
+
+    selection : str, optional
+        Price column. Defaults to 'Adj Close'.
+
+    Returns
+    -------
+    metrics : pd.DataFrame
+        Indexed by end date with columns 'Start', 'Years', 'Start Price',
+        'End Price', 'Growth' and 'Yrly Growth'. For each end date the
+        values match those of `fromeq()` with the same `yrs` and `end`:
+        the period starts with the first session on or after the date `yrs`
+        earlier. Rows are NaN where that date precedes the first date
+        in `eqdata`.
+    """
+    yrs = kwargs.get('yrs', 1)
+    selection = kwargs.get('selection', 'Adj Close')
+    if isinstance(eqdata, np.ndarray):
+        index = pd.DatetimeIndex(kwargs['index'])
+        prices = eqdata
+    else:
+        index = eqdata.index
+        prices = eqdata.loc[:, selection].values
+    offset = pd.tseries.offsets.DateOffset(months=12)
+    startdates = index - yrs * offset
+    ok = startdates >= index[0]
+    startix = np.where(ok, index.searchsorted(startdates), 0)
+    start = np.where(ok, index.values[startix], np.datetime64('NaT'))
+    days = (index.values - start).astype('timedelta64[D]')
+    years = np.where(ok, days.astype(np.float64) / 365.25, np.nan)
+    start_prices = np.where(ok, prices[startix], np.nan)
+    growth = prices / start_prices
+    with np.errstate(invalid='ignore', divide='ignore'):
+        yrly_growth = np.exp(np.log(growth) / years)
+    return pd.DataFrame({'Start': start, 'Years': years, 'Start Price': start_prices,
+        'End Price': np.where(ok, prices, np.nan), 'Growth': growth, 'Yrly Growth': yrly_growth},
+        index=index, columns=['Start', 'Years', 'Start Price', 'End Price', 'Growth',
+            'Yrly Growth'])
+
+def fromdata_many(prices, **kwargs):
+    """
+    Get performance metrics for a panel of equities over
+    several horizons.
+
+    All equities and horizons are handled with array operations
+    on the full price matrix rather than one equity at a time.
+
+    Parameters
+    ----------
+    prices : pd.DataFrame
+        Date-aligned prices with one column per equity. Missing
+        prices are NaN.
+
+    yrs : list of int, optional
+        Horizons in years. Defaults to `[1, 3, 5]`.
+
+    end : pd.Timestamp, optional
+        Value convertible to a pandas Timestamp.
+        Defaults to last date in `prices`.
+
+    risk_free : float, optional
+        Annual risk-free rate used for the Sharpe ratio.
+        Defaults to 0.
+
+    sessions_per_yr : int, optional
+        Used to annualize the Sharpe ratio. Defaults to 252.
+
+    Returns
+    -------
+    metrics : pd.DataFrame
+        Indexed by equity with a column for each combination of horizon
+        and metric. As in `fromeq()`, each horizon ends with the last
+        available price on or before `end` and starts with the first
+        available price on or after the same date `yrs` earlier. Metrics
+        are those returned by `fromdata()` plus 'Max Drawdown', the
+        largest fractional decline from a previous high, and 'Sharpe',
+        the annualized Sharpe ratio of daily returns. All metrics are
+        NaN for equities without a price on or before the start date.
+
+    Usage
+    -----
+    metrics = perf.fromdata_many(prices, yrs=[1, 3])
+    metrics.loc[:, (3, 'Yrly Growth')].sort_values()
+    """
+    yrs_list = kwargs.get('yrs', [1, 3, 5])
+    end = pd.Timestamp(kwargs.get('end', prices.index[-1]))
+    sessions_per_yr = kwargs.get('sessions_per_yr', 252)
+    daily_rf = kwargs.get('risk_free', 0.) / sessions_per_yr
+    dates = prices.index.values
+    values = prices.values.astype(np.float64)
+    n_dates, n_eqs = values.shape
+    rows = np.arange(n_dates)[:, np.newaxis]
+    valid = ~np.isnan(values)
+    # for each row, last valid row on or before it and first valid row on or after it
+    prev_valid = np.maximum.accumulate(np.where(valid, rows, -1), axis=0)
+    next_valid = np.minimum.accumulate(np.where(valid, rows, n_dates)[::-1], axis=0)[::-1]
+    next_valid = np.vstack((next_valid, np.full((1, n_eqs), n_dates)))
+    endrow = prices.index.searchsorted(end, side='right') - 1
+    endix = prev_valid[endrow] if endrow >= 0 else np.full(n_eqs, -1)
+    firstdates = dates[np.minimum(next_valid[0], n_dates - 1)]
+    offset = pd.tseries.offsets.DateOffset(months=12)
+    metrics = {}
+    for yrs in yrs_list:
+        startdates = pd.DatetimeIndex(dates[np.maximum(endix, 0)]) - yrs * offset
+        startix = next_valid[prices.index.searchsorted(startdates), np.arange(n_eqs)]
+        # no metrics for a horizon longer than the equity's history
+        ok = (endix >= 0) & (startix < endix) & (startdates.values >= firstdates)
+        startix = np.where(ok, startix, 0)
+        stopix = np.where(ok, endix, 0)
+        horizon = np.where((rows >= startix) & (rows <= stopix) & ok, values, np.nan)
+        for key, val in _horizon_metrics(dates, horizon, startix, stopix, ok, daily_rf,
+                sessions_per_yr).items():
+            metrics[(yrs, key)] = val
+    columns = pd.MultiIndex.from_product([yrs_list, ['Start', 'End', 'Years', 'Start Price',
+        'End Price', 'Growth', 'Yrly Growth', 'Max Drawdown', 'Sharpe']])
+    return pd.DataFrame(metrics, index=prices.columns, columns=columns)
+
+def _horizon_metrics(dates, horizon, startix, endix, ok, daily_rf, sessions_per_yr):
+    """
+    Metrics for each column of `horizon`, which contains only the
+    prices between `startix` and `endix`, with NaN elsewhere.
+    Columns for which `ok` is False have no valid horizon.
+    """
+    cols = np.arange(horizon.shape[1])
+    metrics = {}
+    metrics['Start'] = np.where(ok, dates[startix], np.datetime64('NaT'))
+    metrics['End'] = np.where(ok, dates[endix], np.datetime64('NaT'))
+    days = (metrics['End'] - metrics['Start']).astype('timedelta64[D]')
+    metrics['Years'] = np.where(ok, days.astype(np.float64) / 365.25, np.nan)
+    metrics['Start Price'] = horizon[startix, cols]
+    metrics['End Price'] = horizon[endix, cols]
+    rets = horizon[1:] / horizon[:-1] - 1.
+    n_rets = (~np.isnan(rets)).sum(axis=0)
+    highs = np.fmax.accumulate(horizon, axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        metrics['Growth'] = metrics['End Price'] / metrics['Start Price']
+        metrics['Yrly Growth'] = np.exp(np.log(metrics['Growth']) / metrics['Years'])
+        metrics['Max Drawdown'] = 1. - np.nanmin(np.where(np.isnan(horizon), np.inf,
+            horizon / highs), axis=0)
+        mean_ret = np.nansum(rets, axis=0) / n_rets
+        std_ret = np.sqrt(np.nansum((rets - mean_ret) ** 2, axis=0) / (n_rets - 1))
+        metrics['Sharpe'] = np.sqrt(sessions_per_yr) * (mean_ret - daily_rf) / std_ret
+    metrics['Max Drawdown'][~ok] = np.nan
+    return metrics
@@ -0,0 +1,183 @@
+"""
+common/pricestore.py
+
+(c) 2017 Marshall Farrier
+license http://opensource.org/licenses/MIT
+
+Local on-disk cache of price history
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+
+class NotCached(Exception):
+    pass
+
+
+class PriceStore(object):
+    """
+    Price history cached as one file per equity.
+
+    Each file holds the date index and one array per column, along
+    with the date range for which data has been requested. Requests
+    within that range are served locally. Missing leading or trailing
+    ranges are retrieved using `fetch`, if one is available, and added
+    to the cache.
+
+    Usage
+    -----
+    store = PriceStore('~/.mfstockmkt/prices', pn.data.get)
+    eqdata = store.get('AAPL', '2010', '2016')
+
+    A store without `fetch` works offline, for example on a
+    directory of test fixtures:
+
+    store = PriceStore('fixtures')
+    store.put('AAPL', eqdata)
+    """
+    def __init__(self, root, fetch=None):
+        """
+        Parameters
+        ----------
+        root : str
+            Directory containing cached files. Created if it
+            doesn't exist.
+
+        fetch : function, optional
+            Function `fetch(equity, start, end)` returning a DataFrame
+            of prices indexed by date, such as `pn.data.get`.
+            If omitted, only cached data is served.
+        """
+        self.root = os.path.expanduser(root)
+        self.fetch = fetch
+        os.makedirs(self.root, exist_ok=True)
+
+    def get(self, equity, start, end=None):
+        """
+        Get price history for an equity.
+
+        Parameters
+        ----------
+        equity : str
+
+        start : Timestamp
+            Value convertible to a pandas Timestamp.
+
+        end : Timestamp, optional
+            Value convertible to a pandas Timestamp.
+            Defaults to current date.
+
+        Returns
+        -------
+        eqdata : DataFrame
+            Prices with dates from `start` through `end`.
+
+        Raises
+        ------
+        NotCached
+            If data isn't available locally and can't be retrieved,
+            including when the store works offline and `start` is
+            before the beginning of the cached range. Missing data at
+            the end of the range is not an error.
+        """
+        start = pd.Timestamp(start)
+        end = pd.Timestamp(pd.to_datetime('today').normalize() if end is None else end)
+        eqdata, covered = self._load(equity)
+        missing = _missing_ranges(covered, start, end)
+        if missing and self.fetch is None and covered is not None and start < covered[0]:
+            # returning the shorter cached range would misstate the period
+            raise NotCached("data for equity '{}' cached only from {}".format(equity,
+                covered[0].strftime('%Y-%m-%d')))
+        if missing and self.fetch is not None:
+            for fetch_start, fetch_end in missing:
+                eqdata = _merge(eqdata, self.fetch(equity, fetch_start, fetch_end))
+            covered = (start, end,) if covered is None else (min(covered[0], start),
+                    max(covered[1], end),)
+            # the current session may not yet have closed
+            covered = (covered[0], min(covered[1], pd.to_datetime('today').normalize() -
+                pd.DateOffset(days=1)),)
+            self._save(equity, eqdata, covered)
+        if eqdata is None:
+            raise NotCached("no cached data for equity '{}'".format(equity))
+        return eqdata.loc[start:end]
+
+    def put(self, equity, eqdata, start=None, end=None):
+        """
+        Add price history for an equity to the cache.
+
+        Parameters
+        ----------
+        equity : str
+
+        eqdata : DataFrame
+            Prices indexed by date.
+
+        start, end : Timestamp, optional
+            Date range that `eqdata` is complete for, such as the range
+            originally requested from the data source. Requests within it
+            are served from the cache even if `eqdata` starts later,
+            for example because `start` is a holiday or the equity
+            was listed after `start`. Default to the first and last
+            dates in `eqdata`.
+        """
+        first = eqdata.index[0] if start is None else pd.Timestamp(start)
+        last = eqdata.index[-1] if end is None else pd.Timestamp(end)
+        cached, covered = self._load(equity)
+        eqdata = _merge(cached, eqdata)
+        if covered is None:
+            covered = (first, last,)
+        else:
+            covered = (min(covered[0], first), max(covered[1], last),)
+        self._save(equity, eqdata, covered)
+
+    def _path(self, equity):
+        return os.path.join(self.root, '{}.npz'.format(equity.upper()))
+
+    def _load(self, equity):
+        path = self._path(equity)
+        if not os.path.isfile(path):
+            return None, None
+        with np.load(path) as cached:
+            columns = cached['columns'].tolist()
+            index = pd.DatetimeIndex(cached['index'].view('datetime64[ns]'), name='Date')
+            eqdata = pd.DataFrame({column: cached['col{}'.format(i)]
+                for i, column in enumerate(columns)}, index=index, columns=columns)
+            covered = tuple(pd.Timestamp(val) for val in cached['covered'].view('datetime64[ns]'))
+        return eqdata, covered
+
+    def _save(self, equity, eqdata, covered):
+        path = self._path(equity)
+        arrays = {'col{}'.format(i): eqdata.iloc[:, i].values
+                for i in range(eqdata.shape[1])}
+        arrays['columns'] = np.array([str(column) for column in eqdata.columns])
+        arrays['index'] = eqdata.index.values.astype('datetime64[ns]').view('int64')
+        arrays['covered'] = np.array([covered[0].value, covered[1].value], dtype='int64')
+        # write to temporary file so that readers never see a partial file
+        tmppath = '{}.tmp'.format(path)
+        with open(tmppath, 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(tmppath, path)
+
+def _missing_ranges(covered, start, end):
+    if covered is None:
+        return [(start, end,)]
+    missing = []
+    day = pd.DateOffset(days=1)
+    if start < covered[0]:
+        missing.append((start, covered[0] - day,))
+    if end > covered[1]:
+        missing.append((covered[1] + day, end,))
+    return missing
+
+def _merge(cached, eqdata):
+    if cached is None:
+        return eqdata.sort_index()
+    if eqdata is None or eqdata.shape[0] == 0:
+        return cached
+    merged = pd.concat([cached, eqdata.loc[:, cached.columns]])
+    # newly fetched values take precedence
+    merged = merged[~merged.index.duplicated(keep='last')]
+    return merged.sort_index()
@@ -0,0 +1,115 @@
+"""
+Unit tests for `pricestore` module
+
+Copyright (c) 2017 Marshall Farrier
+license http://opensource.org/licenses/MIT
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+import pricestore
+from pricestore import NotCached, PriceStore
+
+def _prices(start, end, offset=0.):
+    index = pd.bdate_range(start, end)
+    return pd.DataFrame({'Adj Close': [float(i) + offset for i in range(len(index))]}, index=index)
+
+class TestPriceStore(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.requests = []
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def _fetch(self, equity, start, end):
+        self.requests.append((start, end,))
+        return _prices(start, end, 100.)
+
+    def test_offline_leading_range(self):
+        store = PriceStore(self.root)
+        store.put('AAA', _prices('2016-01-04', '2016-06-30'))
+        eqdata = store.get('AAA', '2016-02-01', '2016-03-31')
+        self.assertEqual(eqdata.index[0], pd.Timestamp('2016-02-01'))
+        self.assertEqual(eqdata.index[-1], pd.Timestamp('2016-03-31'))
+        with self.assertRaises(NotCached):
+            store.get('AAA', '2015-01-01', '2016-03-31')
+        with self.assertRaises(NotCached):
+            store.get('BBB', '2016-02-01', '2016-03-31')
+
+    def test_offline_put_range(self):
+        store = PriceStore(self.root)
+        # 2016-01-01 is a holiday, and BBB is listed later
+        store.put('AAA', _prices('2016-01-04', '2016-06-30'), start='2016-01-01')
+        store.put('BBB', _prices('2016-03-01', '2016-06-30'), start='2016-01-01', end='2016-06-30')
+        self.assertEqual(store.get('AAA', '2016-01-01', '2016-03-31').index[0],
+                pd.Timestamp('2016-01-04'))
+        self.assertEqual(store.get('BBB', '2016-01-01', '2016-03-31').index[0],
+                pd.Timestamp('2016-03-01'))
+        with self.assertRaises(NotCached):
+            store.get('BBB', '2015-12-31', '2016-03-31')
+
+    def test_offline_trailing_range(self):
+        store = PriceStore(self.root)
+        store.put('AAA', _prices('2016-01-04', '2016-06-30'))
+        eqdata = store.get('AAA', '2016-06-01', '2016-12-31')
+        self.assertEqual(eqdata.index[-1], pd.Timestamp('2016-06-30'))
+
+    def test_fetch_missing_ranges(self):
+        store = PriceStore(self.root, self._fetch)
+        store.put('AAA', _prices('2016-03-01', '2016-03-31'))
+        eqdata = store.get('AAA', '2016-02-01', '2016-04-29')
+        day = pd.DateOffset(days=1)
+        self.assertEqual(self.requests, [
+            (pd.Timestamp('2016-02-01'), pd.Timestamp('2016-03-01') - day,),
+            (pd.Timestamp('2016-03-31') + day, pd.Timestamp('2016-04-29'),)])
+        self.assertEqual(eqdata.index[0], pd.Timestamp('2016-02-01'))
+        self.assertEqual(eqdata.index[-1], pd.Timestamp('2016-04-29'))
+        self.assertTrue(eqdata.index.is_unique)
+        # cached values kept where the fetched ranges don't overlap
+        self.assertEqual(eqdata.loc['2016-03-01', 'Adj Close'], 0.)
+        # now served from cache
+        self.requests = []
+        store.get('AAA', '2016-02-15', '2016-04-15')
+        self.assertEqual(self.requests, [])
+
+    def test_covered_capped_before_today(self):
+        store = PriceStore(self.root, self._fetch)
+        today = pd.to_datetime('today').normalize()
+        store.get('AAA', today - pd.DateOffset(days=30))
+        _, covered = store._load('AAA')
+        self.assertEqual(covered[1], today - pd.DateOffset(days=1))
+
+class TestHelpers(unittest.TestCase):
+
+    def test_missing_ranges(self):
+        start = pd.Timestamp('2016-01-01')
+        end = pd.Timestamp('2016-12-31')
+        day = pd.DateOffset(days=1)
+        self.assertEqual(pricestore._missing_ranges(None, start, end), [(start, end,)])
+        self.assertEqual(pricestore._missing_ranges((start, end,), start, end), [])
+        covered = (pd.Timestamp('2016-03-01'), pd.Timestamp('2016-06-30'),)
+        self.assertEqual(pricestore._missing_ranges(covered, start, end),
+                [(start, covered[0] - day,), (covered[1] + day, end,)])
+
+    def test_merge(self):
+        cached = _prices('2016-01-04', '2016-01-08')
+        fetched = _prices('2016-01-07', '2016-01-12', 100.)
+        merged = pricestore._merge(cached, fetched)
+        self.assertTrue(merged.index.is_unique)
+        self.assertTrue(merged.index.is_monotonic_increasing)
+        self.assertEqual(merged.loc['2016-01-06', 'Adj Close'], 2.)
+        # fetched values take precedence
+        self.assertEqual(merged.loc['2016-01-07', 'Adj Close'], 100.)
+        self.assertIs(pricestore._merge(cached, fetched.iloc[:0]), cached)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -9,34 +9,259 @@ Calculate volatility
 
 from argparse import ArgumentParser
 import math
+import sys
 
 import numpy as np
 import pandas as pd
 import pandas_datareader as web
 
+from pricestore import PriceStore
+
 
 class InsufficientData(Exception):
     pass
 
 
 def get(eqdata, window=1, selection='Adj Close'):
+    """
+    Volatility over `window` sessions.
+
+    `eqdata` can be a DataFrame or an array of prices, such as
+    a view returned by `closestore.CloseStore.valid()`.
+    """
     return math.sqrt(window) * get_daily(eqdata, selection)
 
 def get_daily(eqdata, selection='Adj Close'):
-    growthdata = _get_growth_data(eqdata, selection)
-    return _get_daily(growthdata)
+    return daily_stats(_prices(eqdata, selection))[0]
+
+def growth(prices, out=None):
+    """
+    Daily growth `prices[1:] / prices[:-1]`.
+
+    Parameters
+    ----------
+    prices : ndarray
+
+    out : ndarray, optional
+        Array of length `len(prices) - 1` into which the result
+        is written. A new array is allocated if omitted.
+
+    Returns
+    -------
+    growth : ndarray
+    """
+    return np.divide(prices[1:], prices[:-1], out=out)
+
+def daily_stats(prices, out=None):
+    """
+    Standard deviation and mean of daily growth, computed directly
+    on the price buffer.
+
+    Parameters
+    ----------
+    prices : ndarray
+
+    out : ndarray, optional
+        Scratch array of length `len(prices) - 1`. If provided,
+        no array is allocated, and its contents are overwritten.
+
+    Returns
+    -------
+    std : float
+        Daily volatility, as returned by `get_daily()`.
+
+    mean : float
+        Mean daily growth. Subtract 1 for the average daily return.
+    """
+    deviations = growth(prices, out)
+    mean = float(deviations.mean())
+    deviations -= mean
+    std = math.sqrt(float(np.dot(deviations, deviations)) / deviations.shape[0])
+    return std, mean
+
+def rolling(eqdata, lookbacks=21, window=1, selection='Adj Close', log=False):
+    """
+    Rolling volatility over one or more lookbacks.
+
+    Each lookback is computed in O(n) from cumulative sums of
+    returns and squared returns.
+
+    Parameters
+    ----------
+    eqdata : DataFrame or ndarray
+        Source data or array of prices.
+
+    lookbacks : int or list of int, optional
+        Number of daily returns over which the standard deviation is
+        calculated. Defaults to 21.
+
+    window : int, optional
+        Sessions over which volatility is scaled, as for `get()`.
+        Defaults to 1.
+
+    selection : str, optional
+        Price column if `eqdata` is a DataFrame. Defaults to 'Adj Close'.
+
+    log : bool, optional
+        Use log returns rather than simple returns. Defaults to False.
+
+    Returns
+    -------
+    volatility : DataFrame or ndarray
+        One column per lookback and one row per return, with
+        NaN until a full lookback of returns is available. The value
+        at the end of each lookback equals `get()` applied to the
+        `lookback + 1` prices ending on that date if `log` is False.
+        A DataFrame indexed by date is returned for DataFrame input.
+    """
+    lookbacks = _as_list(lookbacks)
+    returns = _returns(eqdata, selection, log)
+    # centering reduces cancellation in the variance
+    deviations = returns - returns.mean()
+    sums = np.concatenate(([0.], deviations.cumsum()))
+    sqsums = np.concatenate(([0.], (deviations ** 2).cumsum()))
+    vols = np.empty((returns.shape[0], len(lookbacks)), dtype=np.float64)
+    vols.fill(np.nan)
+    for j, lookback in enumerate(lookbacks):
+        if lookback > returns.shape[0]:
+            continue
+        mean = (sums[lookback:] - sums[:-lookback]) / lookback
+        var = (sqsums[lookback:] - sqsums[:-lookback]) / lookback - mean ** 2
+        vols[lookback - 1:, j] = np.sqrt(np.maximum(var, 0.) * window)
+    return _wrap(eqdata, vols, lookbacks)
+
+def ewma(eqdata, spans=21, window=1, selection='Adj Close', log=False):
+    """
+    Exponentially weighted moving volatility for one or more spans.
+
+    The variance follows the recursion
+    `var[t] = lam * var[t - 1] + (1 - lam) * ret[t] ** 2`
+    with `lam = 1 - 2 / (span + 1)`, starting from the first squared return.
+
+    Parameters
+    ----------
+    eqdata : DataFrame or ndarray
+        Source data or array of prices.
+
+    spans : int or list of int, optional
+        Defaults to 21.
+
+    window : int, optional
+        Sessions over which volatility is scaled, as for `get()`.
+        Defaults to 1.
+
+    selection : str, optional
+        Price column if `eqdata` is a DataFrame. Defaults to 'Adj Close'.
+
+    log : bool, optional
+        Use log returns rather than simple returns. Defaults to False.
+
+    Returns
+    -------
+    volatility : DataFrame or ndarray
+        One column per span and one row per return.
+    """
+    spans = _as_list(spans)
+    sqreturns = pd.Series(_returns(eqdata, selection, log) ** 2)
+    vols = np.empty((sqreturns.shape[0], len(spans)), dtype=np.float64)
+    for j, span in enumerate(spans):
+        var = sqreturns.ewm(span=span, adjust=False).mean().values
+        vols[:, j] = np.sqrt(var * window)
+    return _wrap(eqdata, vols, spans)
+
+def batch(prices, window=1):
+    """
+    Volatility, average daily return and range of 1 standard
+    deviation for many equities at once.
+
+    Parameters
+    ----------
+    prices : DataFrame
+        Date-aligned prices with one column per equity. Missing
+        prices, such as before an equity starts trading, are NaN.
+
+    window : int, optional
+        Sessions over which volatility and the price range are
+        calculated. Defaults to 1.
+
+    Returns
+    -------
+    summary : DataFrame
+        Indexed by equity, with columns 'Volatility', 'Ave Daily Return',
+        'Price' (last available price), 'Low' and 'High', the last 2
+        as printed by `show()`.
+    """
+    values = prices.values.astype(np.float64)
+    growth = values[1:] / values[:-1]
+    vols = math.sqrt(window) * np.nanstd(growth, axis=0)
+    ave_daily_returns = np.nanmean(growth, axis=0) - 1.
+    lastix = values.shape[0] - 1 - np.argmax(~np.isnan(values[::-1]), axis=0)
+    last_prices = values[lastix, np.arange(values.shape[1])]
+    low, high = _band(window, vols, ave_daily_returns, last_prices)
+    return pd.DataFrame({'Volatility': vols, 'Ave Daily Return': ave_daily_returns,
+        'Price': last_prices, 'Low': low, 'High': high}, index=prices.columns,
+        columns=['Volatility', 'Ave Daily Return', 'Price', 'Low', 'High'])
+
+def batch_fromeqs(equities, window=1, selection='Adj Close', **kwargs):
+    """
+    Retrieve price history for each equity and return the
+    result of `batch()`.
+
+    Parameters
+    ----------
+    equities : list of str
+
+    window : int, optional
+        Defaults to 1.
+
+    selection : str, optional
+        Price column. Defaults to 'Adj Close'.
+
+    start : pd.Timestamp, optional
+        Defaults to 1 year ago.
+
+    cache : str, optional
+        Directory for locally cached price history.
+
+    offline : bool, optional
+        Use only locally cached price history.
+
+    Notes
+    -----
+    Equities for which data can't be retrieved or starts more
+    than 5 days after `start` are reported on stderr and omitted.
+    """
+    kwargs['start'] = kwargs.get('start') or _get_start()
+    prices = {}
+    for equity in equities:
+        try:
+            eqdata = _get_eqdata(equity=equity, **kwargs)
+        except Exception as e:
+            # includes NotCached and remote data errors
+            print("error retrieving data for equity '{}': {}".format(equity, e), file=sys.stderr)
+            continue
+        if len(eqdata) == 0 or eqdata.index[0] > kwargs['start'] + 5 * pd.DateOffset():
+            print("insufficient data for equity '{}'".format(equity), file=sys.stderr)
+            continue
+        prices[equity] = eqdata.loc[:, selection]
+    prices = pd.DataFrame(prices, columns=[equity for equity in equities if equity in prices])
+    return batch(prices, window)
 
 def show(n_sessions, _volatility, ave_daily_return, price):
     price = float(price)
-    diff = price * _volatility
-    mean_price = price + .5 * ave_daily_return * price * n_sessions
+    low, high = _band(n_sessions, _volatility, ave_daily_return, price)
     suffix = '' if n_sessions == 1 else 's'
     print('Volatility over {} session{} : {:.2f} pct'.format(n_sessions, suffix, _volatility * 100.))
     print('Expected return over {} session{} : {:.2f} pct'.format(n_sessions, suffix, ave_daily_return * 100. * n_sessions))
     print('Reference price: $ {:.2f}'.format(price))
     print('Range of 1 std up or down with growth adjustment:')
-    print('Low price: $ {:.2f}'.format(mean_price - diff))
-    print('High price: $ {:.2f}'.format(mean_price + diff))
+    print('Low price: $ {:.2f}'.format(low))
+    print('High price: $ {:.2f}'.format(high))
+
+def _band(n_sessions, _volatility, ave_daily_return, price):
+    diff = price * _volatility
+    mean_price = price + .5 * ave_daily_return * price * n_sessions
+    return mean_price - diff, mean_price + diff
 
 def _get(growthdata, window=1):
     return math.sqrt(window) * _get_daily(growthdata)
@@ -45,35 +270,75 @@ def _get_daily(growthdata):
     return float(np.std(growthdata.values, dtype=np.float64))
 
 def _get_growth_data(eqdata, selection):
-    growthdata = pd.DataFrame(index=eqdata.index[1:], 
-            columns=['Growth'], dtype=np.float64)
-    growthdata.loc[:, 'Growth'] = (eqdata.loc[:, selection].values[1:] /
-            eqdata.loc[:, selection].values[:-1])
-    return growthdata
+    return pd.DataFrame(growth(_prices(eqdata, selection)), index=eqdata.index[1:],
+            columns=['Growth'])
+
+def _prices(eqdata, selection):
+    if isinstance(eqdata, np.ndarray):
+        return eqdata
+    return eqdata.loc[:, selection].values
+
+def _returns(eqdata, selection, log):
+    prices = _prices(eqdata, selection)
+    if log:
+        return np.diff(np.log(prices))
+    return prices[1:] / prices[:-1] - 1.
+
+def _wrap(eqdata, vols, columns):
+    if isinstance(eqdata, np.ndarray):
+        return vols
+    return pd.DataFrame(vols, index=eqdata.index[1:], columns=columns)
+
+def _as_list(vals):
+    try:
+        return list(vals)
+    except TypeError:
+        return [vals]
+
+def _show_batch(summary, as_csv):
+    if as_csv:
+        summary.to_csv(sys.stdout, index_label='Equity', float_format='%.6f')
+    else:
+        print(summary.to_string(float_format=lambda val: '{:.4f}'.format(val)))
 
 def _get_eqdata(**kwargs):
-    eqdata = web.DataReader(kwargs['equity'], 'yahoo', start=kwargs['start'])
-    return eqdata
+    if kwargs.get('cache') is None:
+        return _fetch_eqdata(kwargs['equity'], kwargs['start'])
+    fetch = None if kwargs.get('offline') else _fetch_eqdata
+    return PriceStore(kwargs['cache'], fetch).get(kwargs['equity'], kwargs['start'])
+
+def _fetch_eqdata(equity, start, end=None):
+    return web.DataReader(equity, 'yahoo', start=start, end=end)
 
 def _get_start():
     return pd.to_datetime('today') - pd.DateOffset(years=1) - pd.DateOffset()
 
 def _get_cli_args():
     parser = ArgumentParser()
-    parser.add_argument('equity')
+    parser.add_argument('equities', nargs='+', metavar='equity')
     parser.add_argument('-w', '--window', help='sessions (not days) in volatility window', type=int, default=21)
+    parser.add_argument('-c', '--cache', help='directory for locally cached price history')
+    parser.add_argument('--offline', help='use only locally cached price history', action='store_true')
+    parser.add_argument('--csv', help='write results for all equities as csv', action='store_true')
     return vars(parser.parse_args())
 
 
 if __name__ == '__main__':
     kwargs = _get_cli_args()
     kwargs['start'] = _get_start()
+    equities = kwargs.pop('equities')
+    if len(equities) > 1 or kwargs['csv']:
+        summary = batch_fromeqs(equities, kwargs.pop('window'), start=kwargs['start'],
+                cache=kwargs['cache'], offline=kwargs['offline'])
+        _show_batch(summary, kwargs['csv'])
+        sys.exit(0)
+    kwargs['equity'] = equities[0]
     eqdata = _get_eqdata(**kwargs)
     if eqdata.index[0] > kwargs['start'] + 5 * pd.DateOffset():
         raise InsufficientData("insufficient data for equity '{}'".format(kwargs['equity']))
-    selection = 'Adj Close'
-    growthdata = _get_growth_data(eqdata, selection)
-    _volatility = _get(growthdata, kwargs['window'])
-    ave_daily_return = float(np.mean(growthdata.values, dtype=np.float64)) - 1.
-    show(kwargs['window'], _volatility, ave_daily_return, eqdata.loc[:, 'Adj Close'].values[-1])
+    prices = _prices(eqdata, 'Adj Close')
+    daily_vol, mean_growth = daily_stats(prices)
+    _volatility = math.sqrt(kwargs['window']) * daily_vol
+    ave_daily_return = mean_growth - 1.
+    show(kwargs['window'], _volatility, ave_daily_return, prices[-1])
 
@@ -0,0 +1,133 @@
+"""
+.. Copyright (c) 2016 Marshall Farrier
+   license http://opensource.org/licenses/MIT
+
+Option chain sources
+
+Anything that retrieves option chains takes a `fetch` function
+with the signature of `pn.opt.get`, which is the live source.
+`Recorder` wraps a source and saves every chain it returns, and
+`Replay` serves recorded chains back, optionally with simulated
+latency and failures:
+
+    fetch = Recorder('~/chains/2016-02-22')
+    TrackQuoteMediator(fetch=fetch).start_daemon()
+
+    fetch = Replay('~/chains/2016-02-22', latency=.5, failure_rate=.1)
+    TrackQuoteMediator(fetch=fetch).start_daemon()
+    print(fetch.stats)
+
+Scanners in `options/spreads` and `options/misc` accept the same
+`fetch` argument. This module only depends on pandas and pynance,
+so it can be imported from those directories.
+
+To record the current chains for some underlyings:
+
+    $ python3 chainsource.py ~/chains/2016-02-22 NFLX AAPL
+"""
+
+import os
+import random
+import sys
+import threading
+import time
+
+import pandas as pd
+import pynance as pn
+from pynance.opt.core import Options
+
+class NotRecorded(Exception):
+    pass
+
+class SimulatedFailure(Exception):
+    pass
+
+class Recorder(object):
+    """
+    Option chain source saving each chain retrieved from `fetch`
+    (by default `pn.opt.get`) to `root` before returning it.
+    """
+    def __init__(self, root, fetch=None):
+        self.root = os.path.expanduser(root)
+        self.fetch = fetch or pn.opt.get
+        os.makedirs(self.root, exist_ok=True)
+
+    def __call__(self, equity):
+        opts = self.fetch(equity)
+        path = _path(self.root, equity)
+        tmppath = '{}.tmp'.format(path)
+        pd.to_pickle(opts.data, tmppath)
+        os.replace(tmppath, path)
+        return opts
+
+class Replay(object):
+    """
+    Option chain source serving chains saved by `Recorder`.
+
+    Parameters
+    ----------
+    root : str
+        Directory of recorded chains.
+
+    latency : float, optional
+        Minimum seconds taken by each request.
+
+    jitter : float, optional
+        Maximum random seconds added to `latency`.
+
+    failure_rate : float, optional
+        Fraction of requests raising `SimulatedFailure`.
+
+    seed : int, optional
+        Seed for reproducible latencies and failures.
+    """
+    def __init__(self, root, latency=0., jitter=0., failure_rate=0., seed=None):
+        self.root = os.path.expanduser(root)
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.stats = {'requests': 0, 'failures': 0, 'served': 0}
+        self._random = random.Random(seed)
+        self._chains = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, equity):
+        with self._lock:
+            self.stats['requests'] += 1
+            delay = self.latency + self._random.uniform(0., self.jitter)
+            fail = self._random.random() < self.failure_rate
+        if delay > 0.:
+            time.sleep(delay)
+        if fail:
+            with self._lock:
+                self.stats['failures'] += 1
+            raise SimulatedFailure("simulated failure retrieving options for '{}'".format(equity))
+        opts = Options(self._getchain(equity))
+        with self._lock:
+            self.stats['served'] += 1
+        return opts
+
+    def _getchain(self, equity):
+        key = equity.upper()
+        with self._lock:
+            if key in self._chains:
+                return self._chains[key]
+        path = _path(self.root, equity)
+        if not os.path.isfile(path):
+            raise NotRecorded("no recorded options for '{}' in {}".format(equity, self.root))
+        chain = pd.read_pickle(path)
+        with self._lock:
+            self._chains[key] = chain
+        return chain
+
+def _path(root, equity):
+    return os.path.join(root, '{}.pkl'.format(equity.upper()))
+
+if __name__ == '__main__':
+    if len(sys.argv) < 3:
+        print('usage: {} <directory> <equity> [<equity> ...]'.format(sys.argv[0]))
+        sys.exit(1)
+    recorder = Recorder(sys.argv[1])
+    for equity in sys.argv[2:]:
+        recorder(equity)
+        print("recorded options for '{}'".format(equity))
@@ -13,7 +13,13 @@ ENV = 'dev'
 # LOG_ROOT = '/usr/local/var/log'
 # Ubuntu
 LOG_ROOT = '/var/log/opttrack'
+# 'flat' or 'bucket', see `constants.QUOTE_STORAGE`
+QUOTE_STORAGE = 'flat'
 MONGO_CLIENT = {
         'host': '127.0.0.1',
-        'port': 27017
+        'port': 27017,
+        # connections kept open by the shared client
+        'pool_size': 10,
+        # ping idle client before reuse after this many seconds
+        'health_check_secs': 60
         }
@@ -22,7 +22,28 @@ DB = {
 INT_COLS = ('Vol', 'Open_Int',)
 FLOAT_COLS = ('Last', 'Bid', 'Ask',)
 
+# 'flat': one document per quote in `quotes`
+# 'bucket': one document per contract and month in `quote_buckets`
+QUOTE_STORAGE = ('flat', 'bucket',)
+QUOTE_COLL = {
+        'flat': 'quotes',
+        'bucket': 'quote_buckets',
+        }
+
 MAX_RETRIES = {
         'dev': 2,
         'prod': 4,
         }
+
+# quotes are saved once a batch reaches max_size or has waited max_secs
+QUOTE_BUFFER = {
+        'max_size': 2000,
+        'max_secs': 300,
+        }
+
+# concurrent option chain requests and minimum seconds
+# between requests to the quote host
+FETCH = {
+        'dev': {'workers': 2, 'min_interval': 1.},
+        'prod': {'workers': 8, 'min_interval': .25},
+        }
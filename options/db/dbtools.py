@@ -11,14 +11,28 @@ Tools for working with mongo
 from pymongo.errors import BulkWriteError
 
 def insert_many(logger, coll, entries):
-    bulk = coll.initialize_unordered_bulk_op()
-    for entry in entries:
-        bulk.insert(entry)
-        logger.debug('{} queued for insertion'.format(entry))
+    if not entries:
+        logger.info('no records to save')
+        return
+    logger.debug('inserting {} records'.format(len(entries)))
     try:
-        result = bulk.execute()
+        result = coll.insert_many(entries, ordered=False)
     except BulkWriteError:
         logger.exception("error writing to database")
         raise
     else:
-        logger.info('{} records saved'.format(result['nInserted']))
+        logger.info('{} records saved'.format(len(result.inserted_ids)))
+
+def bulk_write(logger, coll, requests):
+    if not requests:
+        logger.info('no records to save')
+        return
+    logger.debug('writing {} requests'.format(len(requests)))
+    try:
+        result = coll.bulk_write(requests, ordered=False)
+    except BulkWriteError:
+        logger.exception("error writing to database")
+        raise
+    else:
+        logger.info('{} records updated, {} inserted'.format(result.modified_count,
+            result.upserted_count))
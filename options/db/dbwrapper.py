@@ -7,18 +7,131 @@ Connection to MongoDB (:mod:`dbwrapper`)
 
 .. currentmodule:: dbwrapper
 
-Opens and closes db connection.
+Maintains a single pooled db connection for the lifetime
+of the process.
 """
+import threading
+import time
+
 from pymongo import MongoClient
+from pymongo.errors import ConnectionFailure
 
 import config
 
+class ConnectionManager(object):
+    """
+    Long-lived `MongoClient` shared by all jobs.
+
+    The client is created on first use and reused thereafter. If
+    it hasn't been used for `health_check_secs`, it is pinged before
+    reuse and replaced if the server can't be reached. Indexes are
+    created at most once by each process.
+    """
+    def __init__(self, host, port, pool_size=10, health_check_secs=60):
+        self.host = host
+        self.port = port
+        self.pool_size = pool_size
+        self.health_check_secs = health_check_secs
+        self.stats = {'jobs': 0, 'connects': 0, 'reuses': 0, 'reconnects': 0}
+        self._client = None
+        self._last_used = 0.
+        self._indexes = set()
+        self._lock = threading.Lock()
+
+    def job(self, logger, fn):
+        client = self.client(logger)
+        try:
+            return fn(logger, client)
+        except ConnectionFailure:
+            logger.exception('db connection failed, discarding client')
+            self._discard(client)
+            raise
+        finally:
+            self._last_used = time.time()
+
+    def client(self, logger):
+        with self._lock:
+            self.stats['jobs'] += 1
+            if self._client is not None:
+                if self._ishealthy(logger):
+                    self.stats['reuses'] += 1
+                    return self._client
+                self._client.close()
+                self._client = None
+                self.stats['reconnects'] += 1
+            self._client = MongoClient(self.host, self.port, maxPoolSize=self.pool_size)
+            self._last_used = time.time()
+            self.stats['connects'] += 1
+            logger.info("db connection opened")
+            return self._client
+
+    def ensure_index(self, coll, keys, **kwargs):
+        """
+        Create an index on `coll` unless it has already been created
+        by this process. Arguments are as for `create_index()`.
+        """
+        index = (coll.full_name, tuple(keys),)
+        with self._lock:
+            if index in self._indexes:
+                return
+        coll.create_index(keys, **kwargs)
+        with self._lock:
+            self._indexes.add(index)
+
+    def close(self, logger):
+        with self._lock:
+            if self._client is not None:
+                self._client.close()
+                self._client = None
+                logger.info("db connection closed")
+        logger.info('db connection stats: {}'.format(self.stats))
+
+    def _ishealthy(self, logger):
+        if time.time() - self._last_used < self.health_check_secs:
+            return True
+        try:
+            self._client.admin.command('ping')
+        except ConnectionFailure:
+            logger.warn('db health check failed, reconnecting')
+            return False
+        return True
+
+    def _discard(self, client):
+        with self._lock:
+            if self._client is client:
+                self._client.close()
+                self._client = None
+
+_manager = None
+_manager_lock = threading.Lock()
+
 def job(logger, fn):
-    _client = MongoClient(config.MONGO_CLIENT['host'], config.MONGO_CLIENT['port'])
-    logger.info("db connection opened")
-    try:
-        _ret = fn(logger, _client)
-    finally:
-        _client.close()
-        logger.info("db connection closed")
-    return _ret
+    """
+    Call `fn(logger, client)` with the shared client and
+    return the result.
+    """
+    return getmanager().job(logger, fn)
+
+def ensure_index(coll, keys, **kwargs):
+    """
+    Create an index on `coll` once per process.
+    """
+    getmanager().ensure_index(coll, keys, **kwargs)
+
+def close(logger):
+    """
+    Close the shared client. A new client is created by
+    the next call to `job()`.
+    """
+    if _manager is not None:
+        _manager.close(logger)
+
+def getmanager():
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            settings = config.MONGO_CLIENT
+            _manager = ConnectionManager(settings['host'], settings['port'],
+                    pool_size=settings.get('pool_size', 10),
+                    health_check_secs=settings.get('health_check_secs', 60))
+        return _manager
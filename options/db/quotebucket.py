@@ -0,0 +1,84 @@
+"""
+.. Copyright (c) 2016 Marshall Farrier
+   license http://opensource.org/licenses/MIT
+
+Bucketed quote storage
+
+Each document in the `quote_buckets` collection holds one contract's
+quotes for one month as parallel arrays:
+
+    {
+        'Underlying': 'NFLX',
+        'Strike': 95.0,
+        'Expiry': datetime.datetime(2016, 3, 18, 19, 0, tzinfo=<UTC>),
+        'Opt_Type': 'put',
+        'Month': '2016-02',
+        'Opt_Symbol': 'NFLX160318P00095000',
+        'Quote_Time': [datetime.datetime(2016, 2, 22, 21, 0, tzinfo=<UTC>), ...],
+        'Last': [6.9, ...],
+        'Bid': [6.9, ...],
+        'Ask': [7.0, ...],
+        'Vol': [61, ...],
+        'Open_Int': [2247, ...],
+    }
+
+Month is the month of the quote time in New York.
+"""
+
+from collections import OrderedDict
+
+import pymongo
+from pymongo import UpdateOne
+
+import constants
+
+KEY = ('Underlying', 'Strike', 'Expiry', 'Opt_Type', 'Month',)
+ARRAY_FIELDS = ('Quote_Time',) + constants.INT_COLS + constants.FLOAT_COLS
+# unique key for buckets, which also serves queries by underlying
+INDEX = [(field, pymongo.ASCENDING) for field in KEY]
+
+def month(quotetime):
+    return quotetime.strftime('%Y-%m')
+
+def group(quotes):
+    """
+    Group flat quote entries by bucket. Return an ordered
+    dictionary mapping bucket key to entries.
+    """
+    buckets = OrderedDict()
+    for quote in quotes:
+        key = (quote['Underlying'], quote['Strike'], quote['Expiry'], quote['Opt_Type'],
+                month(quote['Quote_Time']),)
+        buckets.setdefault(key, []).append(quote)
+    return buckets
+
+def update(key, quotes):
+    """
+    Upsert for the bucket with key `key`, appending `quotes`
+    to its arrays.
+    """
+    return UpdateOne(dict(zip(KEY, key)), {
+        '$set': {'Opt_Symbol': quotes[0]['Opt_Symbol']},
+        '$push': dict((field, {'$each': [quote[field] for quote in quotes]})
+            for field in ARRAY_FIELDS)},
+        upsert=True)
+
+def updates(quotes):
+    """
+    One upsert per bucket for flat quote entries.
+    """
+    return [update(key, bucketquotes) for key, bucketquotes in group(quotes).items()]
+
+def flatten(bucket):
+    """
+    Reconstruct the flat quote entries stored in `bucket`.
+    """
+    entries = []
+    for i in range(len(bucket['Quote_Time'])):
+        entry = {'Underlying': bucket['Underlying'], 'Strike': bucket['Strike'],
+                'Expiry': bucket['Expiry'], 'Opt_Type': bucket['Opt_Type'],
+                'Opt_Symbol': bucket['Opt_Symbol']}
+        for field in ARRAY_FIELDS:
+            entry[field] = bucket[field][i]
+        entries.append(entry)
+    return entries
@@ -0,0 +1,96 @@
+"""
+.. Copyright (c) 2016 Marshall Farrier
+   license http://opensource.org/licenses/MIT
+
+Write-behind buffer for saving options quotes
+"""
+
+from functools import partial
+import time
+
+from dbwrapper import job
+from quotesaver import savequotes, UnsavedQuotes
+
+class QuoteBuffer(object):
+    """
+    Accumulate extracted quotes across underlyings and save
+    them in batches.
+
+    A batch is saved as soon as it holds `max_size` quotes or its
+    oldest quote has waited `max_secs`. The age of a batch is only
+    checked by `add()` and `flush_if_due()`, so clients waiting
+    between additions should call `flush_if_due()`, for example
+    after sleeping for at most `due_in()` seconds. Remaining quotes
+    are saved only when `flush()` is called, so clients must call
+    `flush()` before stopping.
+    """
+    def __init__(self, logger, max_size=2000, max_secs=300):
+        self.logger = logger
+        self.max_size = max_size
+        self.max_secs = max_secs
+        self._quotes = []
+        self._oldest = None
+
+    def add(self, quotes):
+        if not quotes:
+            return
+        self._quotes.extend(quotes)
+        if self._oldest is None:
+            self._oldest = time.time()
+        if len(self._quotes) >= self.max_size:
+            self.flush()
+        else:
+            self.flush_if_due()
+
+    def flush_if_due(self):
+        """
+        Save all buffered quotes if the oldest has waited `max_secs`.
+        Return the number saved.
+        """
+        if self._oldest is None or time.time() - self._oldest < self.max_secs:
+            return 0
+        return self.flush()
+
+    def due_in(self):
+        """
+        Seconds until buffered quotes are due to be saved, or None
+        if the buffer is empty.
+        """
+        if self._oldest is None:
+            return None
+        return max(0., self._oldest + self.max_secs - time.time())
+
+    def flush(self):
+        """
+        Save all buffered quotes. Return the number saved.
+
+        If saving fails, the quotes that weren't saved are kept for
+        the next attempt and the exception is re-raised.
+        """
+        if not self._quotes:
+            return 0
+        quotes = self._quotes
+        oldest = self._oldest
+        self._quotes = []
+        self._oldest = None
+        started = time.time()
+        try:
+            job(self.logger, partial(savequotes, quotes))
+        except UnsavedQuotes as e:
+            self._restore(e.quotes, oldest)
+            raise
+        except BaseException:
+            # including SystemExit from a signal handler
+            self._restore(quotes, oldest)
+            raise
+        elapsed = time.time() - started
+        self.logger.info('flushed {} quotes in {:.3f} seconds ({:.0f} quotes/sec)'.format(
+            len(quotes), elapsed, len(quotes) / elapsed if elapsed > 0. else float('inf')))
+        return len(quotes)
+
+    def _restore(self, quotes, oldest):
+        self._quotes = quotes + self._quotes
+        self._oldest = oldest if self._oldest is None else min(oldest, self._oldest)
+
+    def __len__(self):
+        return len(self._quotes)
@@ -20,6 +20,8 @@ Example entry:
     }
 """
 
+import numpy as np
+
 import constants
 
 class QuoteExtractor(object):
@@ -29,39 +31,82 @@ class QuoteExtractor(object):
         self.tznyse = tznyse
         self.underlying = underlying
         self.opts = opts
+        self._rowindex = None
 
     def get(self, specs):
         return self._extract_all(specs)
 
     def _extract_all(self, specs):
-        entries = []
         self.logger.info('getting {} quote(s) for {}'.format(len(specs), self.underlying))
+        found = []
+        positions = []
         for spec in specs:
             try:
-                entry = self._extract_one(spec)
+                positions.append(self._find(spec))
             except KeyError:
                 continue
             else:
-                entries.append(entry)
+                found.append(spec)
+        if not found:
+            return []
+        # all requested rows in a single take
+        rows = self.opts.data.iloc[positions]
+        symbols = rows.index.get_level_values(-1)
+        quotetimes = rows.loc[:, 'Quote_Time'].tolist()
+        underlyings = rows.loc[:, 'Underlying'].tolist()
+        cols = {}
+        for key in constants.INT_COLS:
+            cols[key] = self._intcol(rows.loc[:, key].values.astype(np.float64), key, symbols)
+        for key in constants.FLOAT_COLS:
+            cols[key] = rows.loc[:, key].values.astype(np.float64).tolist()
+        entries = []
+        for i, spec in enumerate(found):
+            entry = spec.copy()
+            entry['Opt_Symbol'] = symbols[i]
+            entry['Quote_Time'] = self.tznyse.localize(quotetimes[i].to_datetime())
+            entry['Underlying'] = underlyings[i]
+            for key in cols:
+                entry[key] = cols[key][i]
+            self.logger.debug(entry)
+            entries.append(entry)
         return entries
 
-    def _extract_one(self, spec):
-        entry = spec.copy()
+    def _intcol(self, values, key, symbols):
+        """
+        Integer values as a list, with None where a value is missing.
+        """
+        missing = np.isnan(values)
+        ints = np.where(missing, 0., values).astype(np.int64).tolist()
+        for i in np.flatnonzero(missing):
+            self.logger.warning('no {} for {}, saving as null'.format(key, symbols[i]))
+            ints[i] = None
+        return ints
+
+    def _find(self, spec):
+        """
+        Return the position in `self.opts.data` of the first row
+        matching `spec`.
+        """
+        if self._rowindex is None:
+            self._rowindex = self._buildindex()
         selection = (spec['Strike'], spec['Expiry'].astimezone(self.tznyse).replace(tzinfo=None,
                 hour=0, minute=0, second=0), spec['Opt_Type'],)
         try:
-            entry['Opt_Symbol'] = self.opts.data.loc[selection, :].index[0]
-            opt = self.opts.data.loc[selection, :].iloc[0]
-        except KeyError as e:
+            return self._rowindex[selection]
+        except KeyError:
             self.logger.exception('option not found for {} with {}'
                     .format(self.opts.data.iloc[0, :].loc['Underlying'], selection))
             raise
-        entry['Quote_Time'] = self.tznyse.localize(opt['Quote_Time'].to_datetime())
-        entry['Underlying'] = opt['Underlying']
-        for key in constants.INT_COLS:
-            entry[key] = int(opt[key])
-        for key in constants.FLOAT_COLS:
-            entry[key] = float(opt[key])
-        self.logger.debug(entry)
-        return entry
 
+    def _buildindex(self):
+        """
+        Map (strike, expiry, type) to row position, in a single
+        pass over the chain.
+        """
+        index = self.opts.data.index
+        keys = zip(index.get_level_values(0), index.get_level_values(1),
+                index.get_level_values(2))
+        rowindex = {}
+        for pos, key in enumerate(keys):
+            rowindex.setdefault(key, pos)
+        return rowindex
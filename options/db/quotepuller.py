@@ -12,8 +12,207 @@ Initial spec: Put pulled data into a DataFrame with the obvious
 TimeSeries (quote time) as index and columns describing the option,
 such as (32.0, dt.datetime(2016, 6, 18), 'call'). The content
 would then be price.
+
+Example:
+
+    puller = QuotePuller(logger)
+    df = puller.get('NFLX', start=dt.datetime(2016, 1, 1), field='Bid')
 """
 
+import datetime as dt
+from functools import partial
+from itertools import islice
+
+import numpy as np
+import pandas as pd
+import pymongo
+import pytz
+
+import config
+import constants
+from dbwrapper import ensure_index, job
+import quotebucket
+from quotesaver import storagemode
+
+# documents requested from the server per cursor round trip
+BATCH_SIZE = 10000
+# quotes are selected on Underlying and a range of Quote_Time
+INDEX = [('Underlying', pymongo.ASCENDING), ('Quote_Time', pymongo.ASCENDING)]
+
 class QuotePuller(object):
 
-    pass
+    def __init__(self, logger, tz='US/Eastern'):
+        self.logger = logger
+        self.tz = tz
+
+    def get(self, underlying, start=None, end=None, specs=None, field='Last'):
+        """
+        Get historical quotes for `underlying` as a DataFrame with
+        quote time as index and one column per (strike, expiry, type).
+
+        Parameters
+        ----------
+        underlying : str
+        start, end : datetime, optional
+            Quotes are restricted to `start <= Quote_Time < end`.
+        specs : list of dict, optional
+            Entries with keys 'Strike', 'Expiry' and 'Opt_Type', as
+            stored in the `track` collection. Defaults to all options
+            quoted for `underlying`.
+        field : str
+            Quote field to use as content, one of
+            `constants.INT_COLS + constants.FLOAT_COLS`.
+        """
+        if field not in constants.INT_COLS + constants.FLOAT_COLS:
+            raise ValueError("invalid field '{}'".format(field))
+        if storagemode() == 'bucket':
+            cols = job(self.logger, partial(_getbucketcols, underlying, start, end, specs, field))
+        else:
+            query = _query(underlying, start, end, specs)
+            cols = job(self.logger, partial(_getcols, query, field))
+        return _pivot(cols, field, self.tz)
+
+    def get_flat(self, underlying, start=None, end=None, specs=None):
+        """
+        Get historical quotes for `underlying` as a list of entries
+        as saved by `quotesaver` in flat storage, ordered by quote
+        time, whichever storage is configured. Parameters are as
+        for `get()`.
+        """
+        if storagemode() == 'bucket':
+            entries = job(self.logger, partial(_getbucketentries, underlying, start, end, specs))
+        else:
+            query = _query(underlying, start, end, specs)
+            entries = job(self.logger, partial(_getentries, query))
+        return sorted(entries, key=lambda entry: entry['Quote_Time'])
+
+def _query(underlying, start, end, specs):
+    query = {'Underlying': underlying}
+    quotetime = {}
+    if start is not None:
+        quotetime['$gte'] = start
+    if end is not None:
+        quotetime['$lt'] = end
+    if quotetime:
+        query['Quote_Time'] = quotetime
+    if specs:
+        query['$or'] = [{'Strike': spec['Strike'], 'Expiry': spec['Expiry'],
+            'Opt_Type': spec['Opt_Type']} for spec in specs]
+    return query
+
+def _getcols(query, field, logger, client):
+    dbname = constants.DB[config.ENV]['name']
+    quotecoll = client[dbname].get_collection(constants.QUOTE_COLL['flat'])
+    ensure_index(quotecoll, INDEX)
+    projection = dict.fromkeys(('Quote_Time', 'Strike', 'Expiry', 'Opt_Type', field,), 1)
+    projection['_id'] = 0
+    cursor = quotecoll.find(query, projection).batch_size(BATCH_SIZE)
+    dtypes = _dtypes(field)
+    chunks = {key: [] for key in dtypes}
+    # one array per field for each batch received from the server
+    for batch in iter(lambda: list(islice(cursor, BATCH_SIZE)), []):
+        for key in dtypes:
+            chunks[key].append(np.array([doc[key] for doc in batch], dtype=dtypes[key]))
+    if not chunks[field]:
+        cols = _alloc(0, field)
+    else:
+        cols = {key: np.concatenate(chunks[key]) for key in dtypes}
+    logger.info('pulled {} quotes for {}'.format(len(cols[field]), query['Underlying']))
+    return cols
+
+def _getbucketcols(underlying, start, end, specs, field, logger, client):
+    dbname = constants.DB[config.ENV]['name']
+    bucketcoll = client[dbname].get_collection(constants.QUOTE_COLL['bucket'])
+    ensure_index(bucketcoll, quotebucket.INDEX, unique=True)
+    query = _bucketquery(underlying, start, end, specs)
+    projection = dict.fromkeys(('Quote_Time', 'Strike', 'Expiry', 'Opt_Type', field,), 1)
+    projection['_id'] = 0
+    buckets = list(bucketcoll.find(query, projection).batch_size(BATCH_SIZE))
+    cols = _alloc(sum(len(bucket['Quote_Time']) for bucket in buckets), field)
+    i = 0
+    for bucket in buckets:
+        j = i + len(bucket['Quote_Time'])
+        for key in cols:
+            cols[key][i:j] = bucket[key]
+        i = j
+    logger.info('pulled {} quotes in {} buckets for {}'.format(i, len(buckets), underlying))
+    return _restrict(cols, start, end)
+
+def _getentries(query, logger, client):
+    dbname = constants.DB[config.ENV]['name']
+    quotecoll = client[dbname].get_collection(constants.QUOTE_COLL['flat'])
+    ensure_index(quotecoll, INDEX)
+    entries = list(quotecoll.find(query, {'_id': 0}).batch_size(BATCH_SIZE))
+    logger.info('pulled {} quotes for {}'.format(len(entries), query['Underlying']))
+    return entries
+
+def _getbucketentries(underlying, start, end, specs, logger, client):
+    dbname = constants.DB[config.ENV]['name']
+    bucketcoll = client[dbname].get_collection(constants.QUOTE_COLL['bucket'])
+    ensure_index(bucketcoll, quotebucket.INDEX, unique=True)
+    query = _bucketquery(underlying, start, end, specs)
+    buckets = list(bucketcoll.find(query, {'_id': 0}).batch_size(BATCH_SIZE))
+    start = None if start is None else _utc64(start)
+    end = None if end is None else _utc64(end)
+    entries = [entry for bucket in buckets for entry in quotebucket.flatten(bucket)
+            if (start is None or _utc64(entry['Quote_Time']) >= start)
+            and (end is None or _utc64(entry['Quote_Time']) < end)]
+    logger.info('pulled {} quotes in {} buckets for {}'.format(len(entries), len(buckets), underlying))
+    return entries
+
+def _bucketquery(underlying, start, end, specs):
+    query = _query(underlying, None, None, specs)
+    # bucket months are in New York, so allow a day either side
+    months = {}
+    if start is not None:
+        months['$gte'] = quotebucket.month(start - dt.timedelta(days=1))
+    if end is not None:
+        months['$lte'] = quotebucket.month(end + dt.timedelta(days=1))
+    if months:
+        query['Month'] = months
+    return query
+
+def _restrict(cols, start, end):
+    """
+    Keep only quotes with `start <= Quote_Time < end`.
+    """
+    keep = np.ones(len(cols['Quote_Time']), dtype=bool)
+    if start is not None:
+        keep &= cols['Quote_Time'] >= _utc64(start)
+    if end is not None:
+        keep &= cols['Quote_Time'] < _utc64(end)
+    return {key: cols[key][keep] for key in cols}
+
+def _utc64(when):
+    if when.tzinfo is not None:
+        when = when.astimezone(pytz.utc).replace(tzinfo=None)
+    return np.datetime64(when, 'us')
+
+def _dtypes(field):
+    return {
+            'Quote_Time': 'datetime64[us]',
+            'Expiry': 'datetime64[us]',
+            'Strike': np.float64,
+            'Opt_Type': object,
+            field: np.float64,
+            }
+
+def _alloc(size, field):
+    """
+    Preallocate one array per pulled field.
+    """
+    return {key: np.empty(size, dtype=dtype) for key, dtype in _dtypes(field).items()}
+
+def _pivot(cols, field, tz):
+    """
+    Wide layout: quote time (in `tz`) as index, (strike, expiry, type)
+    as columns. Expiry is the expiration date, without time of day.
+    """
+    quotetimes = pd.DatetimeIndex(cols['Quote_Time']).tz_localize('UTC').tz_convert(tz)
+    expiries = pd.DatetimeIndex(cols['Expiry']).tz_localize('UTC').tz_convert(tz).normalize().tz_localize(None)
+    longdf = pd.DataFrame({field: cols[field]},
+            index=pd.MultiIndex.from_arrays([quotetimes, cols['Strike'], expiries, cols['Opt_Type']],
+                names=['Quote_Time', 'Strike', 'Expiry', 'Opt_Type']))
+    # a quote saved twice would otherwise make unstack() fail
+    longdf = longdf[~longdf.index.duplicated(keep='last')]
+    return longdf[field].unstack(['Strike', 'Expiry', 'Opt_Type']).sort_index(axis=1)
@@ -3,14 +3,65 @@
    license http://opensource.org/licenses/MIT
 
 Save options quotes to mongodb
+
+The storage layout is chosen by `config.QUOTE_STORAGE`, see
+`constants.QUOTE_STORAGE`.
 """
 
+from pymongo.errors import BulkWriteError
+
 import config
 import constants
-from dbtools import insert_many
+from dbtools import bulk_write, insert_many
+from dbwrapper import ensure_index
+import quotebucket
+
+DUPLICATE_KEY = 11000
+
+class UnsavedQuotes(Exception):
+    """
+    Raised when only some quotes were saved. `quotes` holds the
+    others, which can be saved again without duplicating any.
+    """
+    def __init__(self, quotes, error):
+        super(UnsavedQuotes, self).__init__('{} quotes not saved: {}'.format(len(quotes), error))
+        self.quotes = quotes
 
 def savequotes(quotes, logger, client):
     logger.info('saving {} quotes'.format(len(quotes)))
     dbname = constants.DB[config.ENV]['name']
     db = client[dbname]
-    insert_many(logger, db.get_collection('quotes'), quotes)
+    storage = storagemode()
+    coll = db.get_collection(constants.QUOTE_COLL[storage])
+    if storage == 'bucket':
+        ensure_index(coll, quotebucket.INDEX, unique=True)
+        buckets = list(quotebucket.group(quotes).items())
+        try:
+            bulk_write(logger, coll, [quotebucket.update(key, bucketquotes)
+                for key, bucketquotes in buckets])
+        except BulkWriteError as e:
+            # a failed upsert appended none of its bucket's quotes
+            unsaved = [quote for i in _failed(e) for quote in buckets[i][1]]
+            raise UnsavedQuotes(unsaved, e)
+    else:
+        try:
+            insert_many(logger, coll, quotes)
+        except BulkWriteError as e:
+            # insert_many() sets '_id' on each entry, so a duplicate
+            # key means the quote was saved by an earlier attempt
+            unsaved = [quotes[i] for i in _failed(e, skip=(DUPLICATE_KEY,))]
+            if unsaved:
+                raise UnsavedQuotes(unsaved, e)
+            logger.info('{} quotes already saved'.format(len(e.details['writeErrors'])))
+
+def _failed(error, skip=()):
+    """
+    Positions of the requests that failed in a `BulkWriteError`.
+    """
+    return [err['index'] for err in error.details['writeErrors'] if err['code'] not in skip]
+
+def storagemode():
+    storage = getattr(config, 'QUOTE_STORAGE', 'flat')
+    if storage not in constants.QUOTE_STORAGE:
+        raise ValueError("invalid quote storage '{}'".format(storage))
+    return storage
@@ -0,0 +1,30 @@
+"""
+.. Copyright (c) 2016 Marshall Farrier
+   license http://opensource.org/licenses/MIT
+
+Limit the rate of requests to a remote host
+"""
+
+import threading
+import time
+
+class RateLimiter(object):
+    """
+    Space requests to a host at least `min_interval` seconds
+    apart. Safe for use by multiple threads.
+    """
+    def __init__(self, min_interval):
+        self.min_interval = min_interval
+        self._next = 0.
+        self._lock = threading.Lock()
+
+    def wait(self):
+        """
+        Block until a request may be sent.
+        """
+        with self._lock:
+            now = time.time()
+            start = max(now, self._next)
+            self._next = start + self.min_interval
+        if start > now:
+            time.sleep(start - now)
@@ -5,8 +5,8 @@
 Mediator for workflow to save specific options.
 """
 
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 import datetime as dt
-from functools import partial
 import logging
 import os
 import signal
@@ -19,19 +19,37 @@ import pytz
 
 import config
 import constants
-from dbwrapper import job
+import dbwrapper
 from delayqueue import *
+from quotebuffer import QuoteBuffer
 from quoteextractor import QuoteExtractor
-from quotesaver import savequotes
+from ratelimiter import RateLimiter
 from trackpuller import TrackPuller
 
 class TrackQuoteMediator(object):
 
-    def __init__(self):
+    def __init__(self, fetch=None, workers=None):
+        """
+        Parameters
+        ----------
+        fetch : function, optional
+            Function returning the option chain for an underlying.
+            Defaults to `pn.opt.get`. Cf. `chainsource` for recording
+            and replaying chains.
+
+        workers : int, optional
+            Maximum number of chains retrieved concurrently.
+            Defaults to the value in `constants.FETCH`.
+        """
         self.logger = _getlogger()
         self.prod = config.ENV == 'prod'
+        fetchparams = constants.FETCH['prod' if self.prod else 'dev']
+        self.fetch = fetch or pn.opt.get
+        self.workers = workers or fetchparams['workers']
+        self.ratelimiter = RateLimiter(fetchparams['min_interval'])
         self.tznyse = pytz.timezone('US/Eastern')
         self.done_today = False
+        self.quotebuffer = QuoteBuffer(self.logger, **constants.QUOTE_BUFFER)
         # for auto-failing in dev
         self.counter = 0
 
@@ -39,11 +57,16 @@ class TrackQuoteMediator(object):
         self.logger.info('daemon starting')
         signal.signal(signal.SIGINT, self._stop_handler)
         signal.signal(signal.SIGTERM, self._stop_handler)
-        if self.prod:
-            self._waitfornextclose()
-        while True:
-            self._run_job()
-            self._waitfornextclose()
+        try:
+            if self.prod:
+                self._waitfornextclose()
+            while True:
+                self._run_job()
+                self._waitfornextclose()
+        finally:
+            # not in the signal handler, which may interrupt a thread
+            # holding the connection manager's lock
+            dbwrapper.close(self.logger)
 
     def _run_job(self):
         self.done_today = False
@@ -52,52 +75,107 @@ class TrackQuoteMediator(object):
         queue = DelayQueue()
         for underlying in totrack:
             queue.put({'eq': underlying, 'specs': totrack[underlying], 'n_retries': 0})
-        delay_secs = 0
         self.counter = 0
         param_key = 'prod' if self.prod else 'dev'
         max_retries = constants.MAX_RETRIES[param_key]
-        while True:
-            try:
-                item = queue.get()
-                success = self._processqitem(item)
-                if not success:
-                    item['n_retries'] += 1
-                    if item['n_retries'] > max_retries:
-                        msg = ('{} retries would exceed maximum of {}, '
-                                'abandoning spec for {}').format(item['n_retries'],
-                                max_retries, item['eq'])
-                        self.logger.warn(msg)
-                    else:
-                        queue.put(item, self._waittoretry(item['n_retries']))
-            except Empty:
-                self.done_today = True
-                self.logger.info('done for today')
-                break
-            except NotReady:
-                delay_secs = queue.ask()
-                self.logger.info('queue not ready, waiting {:.1f} seconds'.format(delay_secs))
-                time.sleep(delay_secs)
+        try:
+            self._processqueue(queue, max_retries)
+        finally:
+            self.quotebuffer.flush()
         self.logger.info('finished processing queue')
+        self.logger.info('db connection stats: {}'.format(dbwrapper.getmanager().stats))
+
+    def _processqueue(self, queue, max_retries):
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            pending = {}
+            while True:
+                self._submitready(executor, queue, pending, max_retries)
+                if not pending:
+                    try:
+                        delay_secs = queue.ask()
+                    except Empty:
+                        self.done_today = True
+                        self.logger.info('done for today')
+                        break
+                    self.quotebuffer.flush_if_due()
+                    delay_secs = self._untilflush(delay_secs)
+                    self.logger.info('queue not ready, waiting {:.1f} seconds'.format(delay_secs))
+                    time.sleep(delay_secs)
+                    self.quotebuffer.flush_if_due()
+                    continue
+                done, _ = wait(pending, timeout=self._untilflush(self._nextready(queue, pending)),
+                        return_when=FIRST_COMPLETED)
+                self.quotebuffer.flush_if_due()
+                for future in done:
+                    item = pending.pop(future)
+                    quotes = future.result()
+                    if quotes is None:
+                        self._retry(queue, item, max_retries)
+                    else:
+                        self.quotebuffer.add(quotes)
 
-    def _processqitem(self, item):
-        self.counter += 1
-        if not self.prod and self.counter % 3 == 0:
-            self.logger.debug('auto-failing quotes for {} in dev'.format(item['eq']))
-            return False
+    def _submitready(self, executor, queue, pending, max_retries):
+        while len(pending) < self.workers:
+            try:
+                item = queue.get()
+            except (Empty, NotReady):
+                return
+            self.counter += 1
+            if not self.prod and self.counter % 3 == 0:
+                self.logger.debug('auto-failing quotes for {} in dev'.format(item['eq']))
+                self._retry(queue, item, max_retries)
+                continue
+            pending[executor.submit(self._getquotes, item)] = item
+
+    def _nextready(self, queue, pending):
+        """
+        Seconds to wait for a running request before checking the
+        queue again, or None if no more requests can be started.
+        """
+        if len(pending) >= self.workers:
+            return None
         try:
-            opts = pn.opt.get(item['eq'])
-        except AttributeError:
-            self.logger.exception('error retrieving option data for {}'.format(item['eq']))
-            return False
+            return queue.ask()
+        except Empty:
+            return None
+
+    def _untilflush(self, secs):
+        """
+        Limit a wait of `secs` seconds (None for no limit) so that
+        buffered quotes are saved when due.
+        """
+        due_secs = self.quotebuffer.due_in()
+        if due_secs is None:
+            return secs
+        if secs is None:
+            return due_secs
+        return min(secs, due_secs)
+
+    def _retry(self, queue, item, max_retries):
+        item['n_retries'] += 1
+        if item['n_retries'] > max_retries:
+            msg = ('{} retries would exceed maximum of {}, '
+                    'abandoning spec for {}').format(item['n_retries'],
+                    max_retries, item['eq'])
+            self.logger.warn(msg)
+        else:
+            queue.put(item, self._waittoretry(item['n_retries']))
+
+    def _getquotes(self, item):
+        """
+        Retrieve the chain for an item and return the extracted
+        quotes, or None on failure. Runs in a worker thread.
+        """
+        self.ratelimiter.wait()
+        try:
+            opts = self.fetch(item['eq'])
         except Exception:
             self.logger.exception('error retrieving option data for {}'.format(item['eq']))
-            return False
-        else:
-            self.logger.info('successfully retrieved options data for {}'.format(item['eq']))
-            quotes = QuoteExtractor(self.logger, item['eq'], opts, self.tznyse).get(item['specs'])
-            self.logger.info('{} quote(s) extracted for {}'.format(len(quotes), item['eq']))
-            job(self.logger, partial(savequotes, quotes))
-            return True
+            return None
+        self.logger.info('successfully retrieved options data for {}'.format(item['eq']))
+        quotes = QuoteExtractor(self.logger, item['eq'], opts, self.tznyse).get(item['specs'])
+        self.logger.info('{} quote(s) extracted for {}'.format(len(quotes), item['eq']))
+        return quotes
 
     def _waittoretry(self, n_retries):
         if self.prod:
@@ -128,6 +206,7 @@ class TrackQuoteMediator(object):
     def _stop_handler(self, sig, frame):
         msg = ('SIGINT' if sig == signal.SIGINT else 'SIGTERM')
         self.logger.info('signal {} received. stopping'.format(msg))
+        # buffered quotes are saved as SystemExit unwinds through _run_job()
         sys.exit(0)
 
 def _is_bday(date):
@@ -7,10 +7,14 @@ Get options to be tracked
 
 import datetime as dt
 from bson.codec_options import CodecOptions
+import pymongo
 
 import config
 import constants
-from dbwrapper import job
+from dbwrapper import ensure_index, job
+
+# active entries are selected on Expiry and grouped by Underlying
+INDEX = [('Expiry', pymongo.ASCENDING), ('Underlying', pymongo.ASCENDING)]
 
 class TrackPuller(object):
 
@@ -24,19 +28,20 @@ class TrackPuller(object):
         return job(self.logger, _getactive)
 
 def _getactive(logger, client):
-    totrack = {}
     dbname = constants.DB[config.ENV]['name']
     _db = client[dbname]
     c_opts = CodecOptions(tz_aware=True)
     trackcoll = _db.get_collection('track', codec_options=c_opts)
+    ensure_index(trackcoll, INDEX)
     utcnow = dt.datetime.utcnow()
-    for entry in trackcoll.find({'Expiry': {'$gt': utcnow}}):
-        _addentry(totrack, entry)
+    pipeline = [
+            {'$match': {'Expiry': {'$gt': utcnow}}},
+            {'$project': {'_id': 0, 'Underlying': 1, 'Opt_Type': 1, 'Strike': 1, 'Expiry': 1}},
+            {'$group': {'_id': '$Underlying',
+                'specs': {'$push': {'Opt_Type': '$Opt_Type', 'Strike': '$Strike', 'Expiry': '$Expiry'}}}},
+            ]
+    totrack = {}
+    for group in trackcoll.aggregate(pipeline):
+        totrack[group['_id']] = group['specs']
     logger.info('found active track entries for {} equities'.format(len(totrack)))
     return totrack
-
-def _addentry(totrack, entry):
-    if entry['Underlying'] not in totrack:
-        totrack[entry['Underlying']] = []
-    totrack[entry['Underlying']].append({'Opt_Type': entry['Opt_Type'],
-        'Strike': entry['Strike'], 'Expiry': entry['Expiry']})
@@ -16,6 +16,7 @@ import pytz
 
 import config
 import constants
+import dbwrapper
 from dbwrapper import job
 
 class Menu(object):
@@ -49,6 +50,7 @@ class Menu(object):
             print('\n0. Quit')
             choice = input('\nEnter selection: ')
             proceed = self._exec_menu('main', choice)
+        dbwrapper.close(self.logger)
         
     def _exec_menu(self, name, choice):
         try:
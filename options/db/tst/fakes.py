@@ -0,0 +1,135 @@
+"""
+Test doubles for mongo and the tracking daemon's configuration
+
+Copyright (c) 2016 Marshall Farrier
+license http://opensource.org/licenses/MIT
+"""
+
+import copy
+import importlib.util
+import itertools
+import os
+import sys
+
+from pymongo.errors import AutoReconnect, BulkWriteError
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+try:
+    import config
+except ImportError:
+    # `config.py` is created for each installation from the example
+    spec = importlib.util.spec_from_file_location('config',
+            os.path.join(os.path.dirname(__file__), '..', 'config.defaults.py'))
+    config = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(config)
+    sys.modules['config'] = config
+
+DUPLICATE_KEY = 11000
+OTHER_ERROR = 2
+
+_names = itertools.count()
+
+class FakeCollection(object):
+    """
+    Collection supporting the writes used by `quotesaver` and
+    the queries used by `quotepuller`.
+
+    `failures` is a list with one entry per call to `insert_many()`
+    or `bulk_write()`: a set of request positions which fail, or
+    an int `n` to raise `AutoReconnect` after applying `n` requests.
+    Later calls succeed.
+    """
+    def __init__(self, failures=()):
+        self.docs = {}
+        self.failures = list(failures)
+        self.full_name = 'test.coll{}'.format(next(_names))
+        self.indexes = []
+        self._ids = itertools.count()
+
+    def create_index(self, keys, **kwargs):
+        self.indexes.append(keys)
+
+    def insert_many(self, entries, ordered=True):
+        for entry in entries:
+            # as pymongo does, before anything is sent to the server
+            entry.setdefault('_id', next(self._ids))
+        def insert(entry):
+            if entry['_id'] in self.docs:
+                return DUPLICATE_KEY
+            self.docs[entry['_id']] = copy.deepcopy(entry)
+        return self._apply(entries, insert)
+
+    def bulk_write(self, requests, ordered=True):
+        def upsert(request):
+            key = tuple(sorted(request._filter.items()))
+            doc = self.docs.setdefault(key, dict(request._filter))
+            doc.update(request._doc['$set'])
+            for field, values in request._doc['$push'].items():
+                doc.setdefault(field, []).extend(values['$each'])
+        return self._apply(requests, upsert)
+
+    def find(self, query, projection=None):
+        docs = [copy.deepcopy(doc) for doc in self.docs.values() if _matches(doc, query)]
+        if projection is not None:
+            for doc in docs:
+                for field in [field for field in projection if not projection[field]]:
+                    doc.pop(field, None)
+        return FakeCursor(docs)
+
+    def _apply(self, requests, write):
+        failure = self.failures.pop(0) if self.failures else set()
+        failing = failure if isinstance(failure, set) else set()
+        errors = []
+        for i, request in enumerate(requests):
+            if isinstance(failure, int) and i == failure:
+                raise AutoReconnect('connection lost')
+            code = OTHER_ERROR if i in failing else write(request)
+            if code is not None:
+                errors.append({'index': i, 'code': code, 'errmsg': 'write failed'})
+        if errors:
+            raise BulkWriteError({'writeErrors': errors, 'writeConcernErrors': [], 'nInserted': 0,
+                'nUpserted': 0, 'nMatched': 0, 'nModified': 0, 'nRemoved': 0, 'upserted': []})
+        return FakeResult(requests)
+
+class FakeCursor(list):
+
+    def batch_size(self, size):
+        return self
+
+class FakeResult(object):
+
+    def __init__(self, requests):
+        self.inserted_ids = [None] * len(requests)
+        self.modified_count = 0
+        self.upserted_count = len(requests)
+
+def _matches(doc, query):
+    for field, cond in query.items():
+        if field == '$or':
+            if not any(_matches(doc, subquery) for subquery in cond):
+                return False
+        elif isinstance(cond, dict):
+            for op, value in cond.items():
+                if not RANGE_OPS[op](doc[field], value):
+                    return False
+        elif doc.get(field) != cond:
+            return False
+    return True
+
+RANGE_OPS = {
+        '$gte': lambda x, y: x >= y,
+        '$gt': lambda x, y: x > y,
+        '$lte': lambda x, y: x <= y,
+        '$lt': lambda x, y: x < y,
+        }
+
+class FakeClient(object):
+
+    def __init__(self, collections):
+        self.collections = collections
+
+    def __getitem__(self, dbname):
+        return self
+
+    def get_collection(self, name, **kwargs):
+        return self.collections[name]
@@ -0,0 +1,31 @@
+"""
+Unit tests for `dbwrapper` module
+
+Copyright (c) 2016 Marshall Farrier
+license http://opensource.org/licenses/MIT
+"""
+
+import unittest
+
+import pymongo
+
+from fakes import FakeCollection
+import dbwrapper
+
+class TestEnsureIndex(unittest.TestCase):
+
+    def test_once(self):
+        manager = dbwrapper.ConnectionManager('127.0.0.1', 27017)
+        coll = FakeCollection()
+        othercoll = FakeCollection()
+        keys = [('Underlying', pymongo.ASCENDING)]
+        otherkeys = [('Expiry', pymongo.ASCENDING)]
+        manager.ensure_index(coll, keys)
+        manager.ensure_index(coll, keys)
+        manager.ensure_index(coll, otherkeys)
+        manager.ensure_index(othercoll, keys)
+        self.assertEqual(coll.indexes, [keys, otherkeys])
+        self.assertEqual(othercoll.indexes, [keys])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+"""
+Unit tests for `quotebuffer` module
+
+Copyright (c) 2016 Marshall Farrier
+license http://opensource.org/licenses/MIT
+"""
+
+import datetime as dt
+import logging
+import unittest
+
+from pymongo.errors import AutoReconnect
+
+from fakes import config, FakeClient, FakeCollection
+import quotebuffer
+import quotesaver
+
+def _quotes(n):
+    return [{'Underlying': 'NFLX', 'Strike': 90. + 5. * (i % 3), 'Expiry': dt.datetime(2016, 3, 18),
+        'Opt_Type': 'put', 'Opt_Symbol': 'NFLX{}'.format(i % 3),
+        'Quote_Time': dt.datetime(2016, 2, 22 + i // 3, 16), 'Vol': i, 'Open_Int': 100,
+        'Last': 1. + i, 'Bid': 1., 'Ask': 2.} for i in range(n)]
+
+class TestFlush(unittest.TestCase):
+
+    def setUp(self):
+        self.storage = getattr(config, 'QUOTE_STORAGE', 'flat')
+        self.job = quotebuffer.job
+        self.buf = quotebuffer.QuoteBuffer(logging.getLogger('test'))
+
+    def tearDown(self):
+        config.QUOTE_STORAGE = self.storage
+        quotebuffer.job = self.job
+
+    def _use(self, storage, coll):
+        config.QUOTE_STORAGE = storage
+        client = FakeClient({'quotes': coll, 'quote_buckets': coll})
+        quotebuffer.job = lambda logger, fn: fn(logger, client)
+
+    def test_flat_partial_failure(self):
+        coll = FakeCollection(failures=[{1, 3}])
+        self._use('flat', coll)
+        self.buf.add(_quotes(5))
+        with self.assertRaises(quotesaver.UnsavedQuotes):
+            self.buf.flush()
+        self.assertEqual(len(self.buf), 2)
+        self.assertEqual(self.buf.flush(), 2)
+        self.assertEqual(len(self.buf), 0)
+        self.assertEqual(sorted(doc['Vol'] for doc in coll.docs.values()), list(range(5)))
+
+    def test_flat_retry_after_connection_loss(self):
+        # the first 3 quotes are saved before the connection is lost
+        coll = FakeCollection(failures=[3, {4}])
+        self._use('flat', coll)
+        self.buf.add(_quotes(6))
+        with self.assertRaises(AutoReconnect):
+            self.buf.flush()
+        self.assertEqual(len(self.buf), 6)
+        # saved quotes are duplicate keys, quote 4 fails again
+        with self.assertRaises(quotesaver.UnsavedQuotes):
+            self.buf.flush()
+        self.assertEqual(len(self.buf), 1)
+        self.buf.flush()
+        self.assertEqual(len(self.buf), 0)
+        self.assertEqual(sorted(doc['Vol'] for doc in coll.docs.values()), list(range(6)))
+
+    def test_bucket_partial_failure(self):
+        coll = FakeCollection(failures=[{1}])
+        self._use('bucket', coll)
+        self.buf.add(_quotes(9))
+        with self.assertRaises(quotesaver.UnsavedQuotes):
+            self.buf.flush()
+        # the 3 quotes of the second bucket
+        self.assertEqual([quote['Vol'] for quote in self.buf._quotes], [1, 4, 7])
+        self.buf.flush()
+        self.assertEqual(len(coll.docs), 3)
+        self.assertEqual(sorted(vol for doc in coll.docs.values() for vol in doc['Vol']),
+                list(range(9)))
+
+if __name__ == '__main__':
+    unittest.main()
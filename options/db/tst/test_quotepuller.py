@@ -0,0 +1,61 @@
+"""
+Unit tests for `quotepuller` module
+
+Copyright (c) 2016 Marshall Farrier
+license http://opensource.org/licenses/MIT
+"""
+
+import copy
+import datetime as dt
+import logging
+import unittest
+
+from fakes import config, FakeClient, FakeCollection
+import quotepuller
+import quotesaver
+
+def _quotes():
+    # quotes for 2 contracts over 2 months
+    quotes = []
+    for day in range(40):
+        for i, opttype in enumerate(('call', 'put')):
+            quotes.append({'Underlying': 'NFLX', 'Strike': 95., 'Expiry': dt.datetime(2016, 6, 17, 20),
+                'Opt_Type': opttype, 'Opt_Symbol': 'NFLX160617{}00095000'.format(opttype[0].upper()),
+                'Quote_Time': dt.datetime(2016, 2, 1, 21) + dt.timedelta(days=day),
+                'Vol': day + i, 'Open_Int': 100 * day, 'Last': 1. + day, 'Bid': .5 + day, 'Ask': 1.5 + day})
+    return quotes
+
+class TestGetFlat(unittest.TestCase):
+
+    def setUp(self):
+        self.storage = getattr(config, 'QUOTE_STORAGE', 'flat')
+        self.job = quotepuller.job
+        self.logger = logging.getLogger('test')
+
+    def tearDown(self):
+        config.QUOTE_STORAGE = self.storage
+        quotepuller.job = self.job
+
+    def _getflat(self, storage, *args):
+        config.QUOTE_STORAGE = storage
+        client = FakeClient({'quotes': FakeCollection(), 'quote_buckets': FakeCollection()})
+        # in bucket storage, buckets are written by `quotebucket.updates()`
+        quotesaver.savequotes(copy.deepcopy(_quotes()), self.logger, client)
+        quotepuller.job = lambda logger, fn: fn(logger, client)
+        return quotepuller.QuotePuller(self.logger).get_flat('NFLX', *args)
+
+    def test_storage(self):
+        expected = sorted(_quotes(), key=lambda quote: quote['Quote_Time'])
+        self.assertEqual(self._getflat('flat'), expected)
+        self.assertEqual(self._getflat('bucket'), expected)
+
+    def test_range(self):
+        start = dt.datetime(2016, 2, 28, 21)
+        end = dt.datetime(2016, 3, 3, 21)
+        expected = [quote for quote in _quotes() if start <= quote['Quote_Time'] < end]
+        self.assertEqual(len(expected), 8)
+        self.assertEqual(self._getflat('flat', start, end), expected)
+        self.assertEqual(self._getflat('bucket', start, end), expected)
+
+if __name__ == '__main__':
+    unittest.main()
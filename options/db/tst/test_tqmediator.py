@@ -0,0 +1,118 @@
+"""
+Unit tests for `tqmediator` module
+
+Copyright (c) 2016 Marshall Farrier
+license http://opensource.org/licenses/MIT
+"""
+
+import datetime as dt
+import logging
+import threading
+import time
+import unittest
+
+from delayqueue import DelayQueue
+
+from fakes import config, FakeClient, FakeCollection
+import quotebuffer
+import tqmediator
+
+MAX_RETRIES = 2
+
+class FakeFetch(object):
+    """
+    Option chain source whose "chains" are the quotes for each
+    underlying, failing for an underlying as often as given in
+    `failures`. Records the number of calls per underlying and
+    the maximum number of concurrent calls.
+    """
+    def __init__(self, failures):
+        self.failures = dict(failures)
+        self.calls = {}
+        self.running = 0
+        self.max_running = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, equity):
+        with self._lock:
+            self.calls[equity] = self.calls.get(equity, 0) + 1
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+            fail = self.failures.get(equity, 0) > 0
+            if fail:
+                self.failures[equity] -= 1
+        try:
+            time.sleep(.01)
+            if fail:
+                raise IOError('no options for {}'.format(equity))
+            return _quotes(equity)
+        finally:
+            with self._lock:
+                self.running -= 1
+
+class FakeExtractor(object):
+
+    def __init__(self, logger, underlying, opts, tz):
+        self.opts = opts
+
+    def get(self, specs):
+        return self.opts
+
+def _quotes(equity):
+    return [{'Underlying': equity, 'Strike': 90. + 5. * i, 'Expiry': dt.datetime(2016, 3, 18),
+        'Opt_Type': 'call', 'Opt_Symbol': '{}{}'.format(equity, i),
+        'Quote_Time': dt.datetime(2016, 2, 22, 16), 'Vol': i, 'Open_Int': 100,
+        'Last': 1., 'Bid': 1., 'Ask': 2.} for i in range(3)]
+
+class TestProcessQueue(unittest.TestCase):
+
+    def setUp(self):
+        self.storage = getattr(config, 'QUOTE_STORAGE', 'flat')
+        self.patched = [(quotebuffer, 'job', quotebuffer.job),
+                (tqmediator, 'QuoteExtractor', tqmediator.QuoteExtractor),
+                (tqmediator, '_getlogger', tqmediator._getlogger)]
+        config.QUOTE_STORAGE = 'flat'
+        self.coll = FakeCollection()
+        client = FakeClient({'quotes': self.coll})
+        quotebuffer.job = lambda logger, fn: fn(logger, client)
+        tqmediator.QuoteExtractor = FakeExtractor
+        tqmediator._getlogger = lambda: logging.getLogger('test')
+
+    def tearDown(self):
+        config.QUOTE_STORAGE = self.storage
+        for module, name, value in self.patched:
+            setattr(module, name, value)
+
+    def _run(self, fetch, equities, workers):
+        mediator = tqmediator.TrackQuoteMediator(fetch=fetch, workers=workers)
+        # no auto-failing, rate limiting or waiting between retries
+        mediator.prod = True
+        mediator.ratelimiter.min_interval = 0.
+        mediator._waittoretry = lambda n_retries: .01
+        mediator.quotebuffer.max_size = 5
+        queue = DelayQueue()
+        for equity in equities:
+            queue.put({'eq': equity, 'specs': [], 'n_retries': 0})
+        mediator._processqueue(queue, MAX_RETRIES)
+        mediator.quotebuffer.flush()
+        self.assertTrue(mediator.done_today)
+        return sorted(doc['Opt_Symbol'] for doc in self.coll.docs.values())
+
+    def test_retries(self):
+        fetch = FakeFetch({'BAD': MAX_RETRIES + 1, 'FLAKY': MAX_RETRIES})
+        saved = self._run(fetch, ['BAD', 'FLAKY', 'GOOD'], 2)
+        self.assertEqual(fetch.calls, {'BAD': MAX_RETRIES + 1, 'FLAKY': MAX_RETRIES + 1, 'GOOD': 1})
+        self.assertEqual(saved, sorted(quote['Opt_Symbol'] for equity in ('FLAKY', 'GOOD')
+            for quote in _quotes(equity)))
+
+    def test_workers(self):
+        equities = ['EQ{}'.format(i) for i in range(20)]
+        fetch = FakeFetch({equity: 1 for equity in equities[::3]})
+        saved = self._run(fetch, equities, 4)
+        self.assertEqual(fetch.max_running, 4)
+        # each quote extracted is saved exactly once
+        self.assertEqual(saved, sorted(quote['Opt_Symbol'] for equity in equities
+            for quote in _quotes(equity)))
+
+if __name__ == '__main__':
+    unittest.main()
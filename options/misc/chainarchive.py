@@ -0,0 +1,162 @@
+"""
+.. Copyright (c) 2016 Marshall Farrier
+   license http://opensource.org/licenses/MIT
+
+Options chain archive (:mod:`chainarchive`)
+===========================================
+
+.. currentmodule:: chainarchive
+
+Full daily options chains stored as compressed columnar files,
+partitioned by date and underlying:
+
+    <root>/2016-02-22/NFLX.npz
+
+Each file holds one array per index level and per column of
+the chain as returned by `pn.opt.get(eq).data`. The reader
+loads strike and expiry arrays first, so that files and
+rows outside the requested strikes and expiries are skipped
+before the remaining columns are read.
+
+Example:
+
+    archive = ChainArchive('/var/lib/opttrack/chains')
+    archive.put('NFLX', pn.opt.get('NFLX').data, dt.date(2016, 2, 22))
+    chains = archive.get('NFLX', '2016-01-01', '2016-06-30',
+            strikes=(80., 120.), expiries=('2016-06-01', '2016-12-31'))
+"""
+
+import datetime as dt
+import os
+
+import numpy as np
+import pandas as pd
+
+DATEFMT = '%Y-%m-%d'
+
+class ChainArchive(object):
+
+    def __init__(self, root):
+        self.root = os.path.expanduser(root)
+
+    def put(self, underlying, chain, date):
+        """
+        Save the full chain for `underlying` on `date`, replacing
+        any chain already saved for that date.
+        """
+        path = self._path(underlying, date)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        arrays = {}
+        names = [str(name) for name in chain.index.names]
+        for i in range(len(names)):
+            values = chain.index.get_level_values(i)
+            arrays['level{}'.format(i)] = _strikes(values) if names[i] == 'Strike' else _storable(values)
+        for i in range(chain.shape[1]):
+            arrays['col{}'.format(i)] = _storable(chain.iloc[:, i])
+        arrays['levels'] = np.array(names)
+        arrays['columns'] = np.array([str(column) for column in chain.columns])
+        tmppath = '{}.tmp'.format(path)
+        with open(tmppath, 'wb') as f:
+            np.savez_compressed(f, **arrays)
+        os.replace(tmppath, path)
+
+    def has(self, underlying, date):
+        return os.path.isfile(self._path(underlying, date))
+
+    def dates(self, underlying, start=None, end=None):
+        """
+        Dates from `start` through `end` for which a chain has been
+        saved for `underlying`.
+        """
+        start = None if start is None else pd.Timestamp(start).strftime(DATEFMT)
+        end = None if end is None else pd.Timestamp(end).strftime(DATEFMT)
+        if not os.path.isdir(self.root):
+            return []
+        dates = []
+        for datestr in sorted(os.listdir(self.root)):
+            if start is not None and datestr < start:
+                continue
+            if end is not None and datestr > end:
+                break
+            if self.has(underlying, datestr):
+                dates.append(pd.Timestamp(datestr))
+        return dates
+
+    def get(self, underlying, start=None, end=None, strikes=None, expiries=None):
+        """
+        Load saved chains for `underlying`.
+
+        Parameters
+        ----------
+        underlying : str
+        start, end : date, optional
+            First and last chain dates to load.
+        strikes : tuple, optional
+            (low, high) inclusive range of strikes to load.
+        expiries : tuple, optional
+            (first, last) inclusive range of expiration dates to load.
+
+        Returns
+        -------
+        chains : DataFrame
+            Chains with the chain date prepended to the index
+            levels they were saved with.
+        """
+        if expiries is not None:
+            expiries = (np.datetime64(pd.Timestamp(expiries[0])),
+                    np.datetime64(pd.Timestamp(expiries[1])),)
+        frames = []
+        for date in self.dates(underlying, start, end):
+            chain = self._load(self._path(underlying, date), strikes, expiries)
+            if chain is not None:
+                frames.append(pd.concat({date: chain}, names=['Date']))
+        if not frames:
+            return pd.DataFrame()
+        return pd.concat(frames)
+
+    def _path(self, underlying, date):
+        if not isinstance(date, str):
+            date = pd.Timestamp(date).strftime(DATEFMT)
+        return os.path.join(self.root, date, '{}.npz'.format(underlying.upper()))
+
+    def _load(self, path, strikes, expiries):
+        with np.load(path) as saved:
+            names = saved['levels'].tolist()
+            keep = None
+            # members of an npz file are only read when accessed
+            if strikes is not None and 'Strike' in names:
+                values = saved['level{}'.format(names.index('Strike'))]
+                keep = (values >= strikes[0]) & (values <= strikes[1])
+            if expiries is not None and 'Expiry' in names:
+                values = saved['level{}'.format(names.index('Expiry'))]
+                inrange = (values >= expiries[0]) & (values <= expiries[1])
+                keep = inrange if keep is None else keep & inrange
+            if keep is not None and not keep.any():
+                return None
+            select = (lambda arr: arr) if keep is None else (lambda arr: arr[keep])
+            index = pd.MultiIndex.from_arrays([select(saved['level{}'.format(i)])
+                for i in range(len(names))], names=names)
+            columns = saved['columns'].tolist()
+            return pd.DataFrame({column: select(saved['col{}'.format(i)])
+                for i, column in enumerate(columns)}, index=index, columns=columns)
+
+def _strikes(values):
+    """
+    Strikes as floats. Strikes with commas, e.g. '1,040.00', are
+    returned as strings by pandas-datareader.
+    """
+    return np.array([float(val.replace(',', '')) if isinstance(val, str) else float(val)
+        for val in values], dtype=np.float64)
+
+def _storable(values):
+    """
+    Array that can be saved without pickling: object values
+    such as symbols and quote times are converted to fixed
+    width strings or datetimes.
+    """
+    values = np.asarray(values)
+    if values.dtype != object:
+        return values
+    if len(values) and isinstance(values[0], (dt.date, np.datetime64)):
+        return pd.to_datetime(values).values
+    return values.astype(str)
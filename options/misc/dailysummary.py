@@ -6,7 +6,7 @@ from __future__ import print_function
 
 import pynance as pn
 
-def summarize():
+def summarize(fetch=None):
     _eq = 'spwr'
     _lowstrike = 28.
     _highstrike = 39.
@@ -15,7 +15,7 @@ def summarize():
     _cost = 9065.04
     _ncontracts = 50
     _nshares = _ncontracts * 100.
-    _opts = pn.opt.get(_eq)
+    _opts = (fetch or pn.opt.get)(_eq)
     _dblcal = _opts.spread.diag.dblcal(_lowstrike, _highstrike, _exp1, _exp2)
     _dblcal.loc['Cost', 'Value'] = _cost
     _dblcal.loc['CostPerShare', 'Value'] = _cost / _nshares
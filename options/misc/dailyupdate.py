@@ -48,8 +48,13 @@ import pymongo
 from pymongo import MongoClient
 import pynance as pn
 
+from chainarchive import ChainArchive
 import conn
 
+# if a chain archive directory is configured, full chains are saved
+# there instead of as individual documents in mongo
+_archive = ChainArchive(_locconst.CHAIN_ARCHIVE) if getattr(_locconst, 'CHAIN_ARCHIVE', None) else None
+
 def mktclose(date):
     return dt.datetime(date.year, date.month, date.day, _constants.TODAYSCLOSE)
 
@@ -57,6 +62,8 @@ def ismktopen(date):
     return date.day == ((date + BDay()) - BDay()).day
 
 def updateeq(db, eq, closingtime):
+    if _archive is not None:
+        return archiveeq(eq, closingtime)
     _quotes = db[_constants.QUOTES]
     _today = dt.datetime(closingtime.year, closingtime.month, closingtime.day, 11)
     if _quotes.find_one({'Underlying': {'$in': [eq.lower(), eq.upper()]}, 'Quote_Time': {'$gte': _today}}) is not None:
@@ -73,6 +80,21 @@ def updateeq(db, eq, closingtime):
         logger.error(e)
         return False
 
+def archiveeq(eq, closingtime):
+    if _archive.has(eq, closingtime):
+        logger.warn("{} chain for '{}' already archived.".format(closingtime.strftime('%Y-%m-%d'), eq))
+        return True
+    logger.info("Downloading options quotes for '{}'".format(eq))
+    try:
+        _opts = pn.opt.get(eq)
+        logger.info("Archiving chain for '{}' in '{}'".format(eq, _archive.root))
+        _archive.put(eq, _opts.data, closingtime)
+        return True
+    except pd.io.data.RemoteDataError as e:
+        logger.error("exception retrieving quotes for '{}'".format(eq))
+        logger.error(e)
+        return False
+
 def updateall(closingtime, tries, client):
     logger.info("Attempt {} of {}".format(tries + 1, _constants.NRETRIES))
     _db = client[_constants.DB]
@@ -49,6 +49,9 @@ DGB_EQUITIES = [
         'YHOO',
         ]
 
+# equities scanned concurrently by `dgb.scan_all()`
+DGB_WORKERS = 8
+
 DGB_TRACK = [
         {   
         'underlying': 'TSLA',
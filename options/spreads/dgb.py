@@ -5,17 +5,25 @@
 Diagonal butterfly scanner
 """
 
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 import locale
 import sys
+import time
 import traceback
 
+import numpy as np
 import pandas as pd
 import pynance as pn
 
 import constants
 import strike
 
-def scan_all():
+# digits to which option prices are rounded by `opts.price.get`
+PRICE_DIGITS = 4
+# call and put strikes closer than this are considered equal
+STRIKE_EPSILON = .01
+
+def scan_all(fetch=None, workers=1, processes=False):
     """
     Scan a list of equities for potential diagonal butterfly spreads.
 
@@ -23,6 +31,16 @@ def scan_all():
     'one would like the underlying stock to be somewhat volatile,
     since there is the possibility that long-term options will
     be owned for free'
+
+    `fetch` is the function used to retrieve each option chain,
+    `pn.opt.get` by default. Cf. `options/db/chainsource.py` for
+    recorded chains.
+
+    With `workers` greater than 1, equities are scanned concurrently
+    in a thread pool, or in a process pool if `processes` is True.
+    Threads overlap retrieving chains, processes also spread the
+    search for butterflies across cores but require `fetch` to be
+    picklable. Results are the same in either case.
     """
     loc = locale.getlocale()
     locale.setlocale(locale.LC_ALL, 'en_US')
@@ -34,23 +52,28 @@ def scan_all():
     if len(equities) != orig_len:
         print('equities list contains {} duplicates'.format(orig_len - len(equities)))
     print('scanning {} equities for diagonal butterfly spreads'.format(len(equities)))
-    butterflies = []
-    for equity in equities:
-        print('{}'.format(equity), end='')
-        try:
-            btfs_for_eq = scan(equity)
-            if len(btfs_for_eq) > 0:
-                butterflies.extend(btfs_for_eq)
-            print('({}).'.format(len(btfs_for_eq)), end='')
-        except Exception:
-            traceback.print_exc()
-        finally:
-            sys.stdout.flush()
+    started = time.time()
+    fetches = [fetch] * len(equities)
+    if workers > 1:
+        poolclass = ProcessPoolExecutor if processes else ThreadPoolExecutor
+        with poolclass(max_workers=workers) as pool:
+            outcomes = list(pool.map(_scaninprocess if processes else _scanone,
+                equities, fetches))
+    else:
+        outcomes = list(map(_scanone, equities, fetches))
     locale.setlocale(locale.LC_ALL, loc)
+    butterflies = []
+    errors = []
+    for equity, btfs_for_eq, error in outcomes:
+        if error is None:
+            butterflies.extend(btfs_for_eq)
+        else:
+            errors.append((equity, error,))
+    _show_summary(outcomes, errors, time.time() - started)
     return butterflies
 
-def scan(equity):
-    opts = pn.opt.get(equity)
+def scan(equity, fetch=None):
+    opts = (fetch or pn.opt.get)(equity)
     nearfilter = {}
     nearfilter['min'] = opts.quotetime() + pd.Timedelta('90 days')
     nearfilter['max'] = opts.quotetime() + pd.Timedelta('135 days')
@@ -63,6 +86,33 @@ def scan(equity):
         butterflies.extend(_btrflies(opts, straddle))
     return butterflies
 
+def _scanone(equity, fetch):
+    """
+    Return `(equity, butterflies, error)`, where `error` is
+    None or the traceback of the exception raised by `scan()`.
+    """
+    try:
+        return equity, scan(equity, fetch), None
+    except Exception:
+        return equity, [], traceback.format_exc()
+
+def _scaninprocess(equity, fetch):
+    # locale isn't inherited by pool processes on all platforms
+    locale.setlocale(locale.LC_ALL, 'en_US')
+    return _scanone(equity, fetch)
+
+def _show_summary(outcomes, errors, elapsed):
+    found = ['{}({})'.format(equity, len(btfs_for_eq)) for equity, btfs_for_eq, error in outcomes
+            if error is None and len(btfs_for_eq) > 0]
+    print('scanned {} equities in {:.1f} seconds'.format(len(outcomes), elapsed))
+    if found:
+        print('spreads found: {}'.format(' '.join(found)))
+    if errors:
+        print('errors for {} equities: {}'.format(len(errors), ' '.join(equity for equity, _ in errors)))
+        for equity, error in errors:
+            print('\n{}:\n{}'.format(equity, error), end='')
+    sys.stdout.flush()
+
 def show_spreads(butterflies):
     if len(butterflies) > 0:
         print('')
@@ -121,41 +171,74 @@ def _btrflies(opts, straddle):
     return butterflies
 
 def _btfsforexp(opts, straddle, exp):
-    callstrikes = strike.allforexp(opts, exp, 'call')
-    putstrikes = strike.allforexp(opts, exp, 'put')
+    """
+    Butterflies for a straddle and far expiry, evaluating all
+    put strikes and their symmetric call strikes at once.
+    """
+    callstrikes, callprices = _legs(opts, exp, 'call')
+    putstrikes, putprices = _legs(opts, exp, 'put')
+    callstrikes, first = np.unique(callstrikes, return_index=True)
+    callprices = callprices[first]
     minputstrike = straddle['strike'] - straddle['price']
+    # put strikes are ascending, so stop at the straddle strike
+    below = np.flatnonzero(putstrikes >= straddle['strike'])
+    n_puts = below[0] if len(below) > 0 else len(putstrikes)
+    selected = putstrikes[:n_puts] >= minputstrike
+    putstrikes = putstrikes[:n_puts][selected]
+    putprices = putprices[:n_puts][selected]
+    distances = straddle['strike'] - putstrikes
+    # proceed only if there is a corresponding call: the highest
+    # call strike within epsilon of the mirrored put strike
+    targets = straddle['strike'] + distances
+    callixs = np.searchsorted(callstrikes, targets + STRIKE_EPSILON, side='right') - 1
+    # `targets + STRIKE_EPSILON` is rounded, so apply the comparison
+    # used by `strike.getlastmatched()` to the strike found
+    above = callixs >= 0
+    above[above] = callstrikes[callixs[above]] - targets[above] >= STRIKE_EPSILON
+    callixs[above] -= 1
+    matched = callixs >= 0
+    matched[matched] = np.abs(targets[matched] - callstrikes[callixs[matched]]) < STRIKE_EPSILON
+    putstrikes = putstrikes[matched]
+    putprices = putprices[matched]
+    distances = distances[matched]
+    callixs = callixs[matched]
+    farprices = callprices[callixs] + putprices
+    credits = straddle['price'] - farprices
+    # no butterflies beyond the first pair without a credit
+    nocredit = np.flatnonzero(credits <= 0.)
+    n_pairs = nocredit[0] if len(nocredit) > 0 else len(credits)
+    risks = distances - credits
     butterflies = []
-    callix = len(callstrikes) - 1
-    for pstrike in putstrikes:
-        if pstrike >= minputstrike:
-            if pstrike >= straddle['strike']:
-                return butterflies
-            distance = straddle['strike'] - pstrike
-            # proceed only if there is a corresponding call
-            sentinel = strike.getlastmatched(straddle['strike'] + distance, callstrikes, callix)
-            if sentinel >= 0:
-                callix = sentinel
-                callprice = getoptprice(opts, 'call', callstrikes[callix], exp)
-                putprice = getoptprice(opts, 'put', pstrike, exp)
-                farprice = callprice + putprice
-                credit = straddle['price'] - farprice
-                if credit <= 0.:
-                    return butterflies
-                risk = distance - credit
-                if risk < credit:
-                    butterflies.append({
-                        'straddle': straddle, 
-                        'call': {'strike': callstrikes[callix], 'price': callprice},
-                        'put': {'strike': pstrike, 'price': putprice},
-                        'farexp': exp,
-                        'risk': risk,
-                        'credit': credit,
-                        'ratio': straddle['price'] / farprice,
-                        'underlying': opts.data.iloc[0, :].loc['Underlying'],
-                        'eqprice': opts.data.iloc[0].loc['Underlying_Price']
-                        })
+    if n_pairs == 0:
+        return butterflies
+    underlying = opts.data.iloc[0, :].loc['Underlying']
+    eqprice = opts.data.iloc[0].loc['Underlying_Price']
+    for i in np.flatnonzero(risks[:n_pairs] < credits[:n_pairs]):
+        butterflies.append({
+            'straddle': straddle,
+            'call': {'strike': callstrikes[callixs[i]], 'price': callprices[callixs[i]]},
+            'put': {'strike': putstrikes[i], 'price': putprices[i]},
+            'farexp': exp,
+            'risk': risks[i],
+            'credit': credits[i],
+            'ratio': straddle['price'] / farprices[i],
+            'underlying': underlying,
+            'eqprice': eqprice
+            })
     return butterflies
 
+def _legs(opts, exp, opttype):
+    """
+    Strikes and prices of all options of type `opttype` expiring
+    on `exp`, in the order of the chain. As with `getoptprice()`,
+    the price for a strike is the midpoint of the first quote.
+    """
+    rows = opts.data.xs((exp, opttype), level=('Expiry', 'Type'))
+    strikes = np.array(strike.tofloats(rows.index.get_level_values(0)), dtype=np.float64)
+    mids = np.round((rows.loc[:, 'Bid'].values + rows.loc[:, 'Ask'].values) / 2., PRICE_DIGITS)
+    _, first, inverse = np.unique(strikes, return_index=True, return_inverse=True)
+    return strikes, mids[first][inverse]
+
 def _straddles(opts, exp):
     """
     Return a list of straddles to examine.
@@ -172,5 +255,5 @@ def _straddles(opts, exp):
     return straddles
 
 if __name__ == '__main__':
-    butterflies = scan_all()
+    butterflies = scan_all(workers=constants.DGB_WORKERS)
     show_spreads(butterflies)
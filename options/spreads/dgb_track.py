@@ -10,11 +10,12 @@ import pynance as pn
 import constants
 import dgb
 
-def show_all():
+def show_all(fetch=None):
+    fetch = fetch or pn.opt.get
     spreads = constants.DGB_TRACK
     for spread in spreads:
         print("getting spread data for '{}'".format(spread['underlying']))
-        opts = pn.opt.get(spread['underlying'])
+        opts = fetch(spread['underlying'])
         spread['straddle']['price'] = dgb.getstraddleprice(opts, spread['straddle']['strike'],
                 spread['straddle']['exp'])
         spread['call']['price'] = dgb.getoptprice(opts, 'call',
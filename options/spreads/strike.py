@@ -19,6 +19,9 @@ def straddle(allstrikes, eqprice):
 
 def allforexp(opts, exp, opttype):
     strikes = opts.data.xs((exp, opttype), level=('Expiry', 'Type')).index.get_level_values(0)
+    return tofloats(strikes)
+
+def tofloats(strikes):
     return list(map(_forcetofloat, strikes))
 
 def matchedforexp(opts, exp):
@@ -0,0 +1,118 @@
+"""
+Unit tests for `dgb` module
+
+Copyright (c) 2016 Marshall Farrier
+license http://opensource.org/licenses/MIT
+"""
+
+import os
+import sys
+import unittest
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+import dgb
+import strike
+
+EXP = pd.Timestamp('2016-09-16')
+
+class _Price(object):
+    """
+    As `opts.price` in pynance: midpoint of the first quote
+    for the option, rounded to 4 digits.
+    """
+    def __init__(self, data):
+        self.data = data
+
+    def get(self, opttype, strike, expiry):
+        row = self.data.loc[(strike, pd.Timestamp(expiry), opttype), :]
+        return round((row.loc[:, 'Bid'].values[0] + row.loc[:, 'Ask'].values[0]) / 2., 4)
+
+class _Opts(object):
+
+    def __init__(self, data):
+        self.data = data
+        self.price = _Price(data)
+
+def _chain(rand):
+    """
+    Random chain with calls and puts on overlapping sets of strikes,
+    some strikes quoted twice and some differing by less than
+    `dgb.STRIKE_EPSILON` from the nearest regular strike.
+    """
+    allstrikes = 60. + 2.5 * np.arange(40)
+    allstrikes[rand.rand(40) < .1] += .005
+    rows = []
+    for opttype in ('call', 'put'):
+        strikes = allstrikes[rand.rand(40) < .8]
+        for strikeval in strikes:
+            intrinsic = max(0., 100. - strikeval) if opttype == 'call' else max(0., strikeval - 100.)
+            for i in range(2 if rand.rand() < .1 else 1):
+                mid = intrinsic + rand.uniform(.5, 8.)
+                rows.append((strikeval, EXP, opttype, 'X{}{}{}'.format(opttype, strikeval, i),
+                    mid - rand.uniform(0., .2), mid + rand.uniform(0., .2), 'XYZ', 100.))
+    data = pd.DataFrame(rows, columns=['Strike', 'Expiry', 'Type', 'Symbol', 'Bid', 'Ask',
+        'Underlying', 'Underlying_Price']).set_index(['Strike', 'Expiry', 'Type', 'Symbol'])
+    return _Opts(data.sort_index())
+
+def _btfsforexp_loop(opts, straddle, exp):
+    """
+    Scanner before vectorization, as reference.
+    """
+    callstrikes = strike.allforexp(opts, exp, 'call')
+    putstrikes = strike.allforexp(opts, exp, 'put')
+    minputstrike = straddle['strike'] - straddle['price']
+    butterflies = []
+    callix = len(callstrikes) - 1
+    for pstrike in putstrikes:
+        if pstrike >= minputstrike:
+            if pstrike >= straddle['strike']:
+                return butterflies
+            distance = straddle['strike'] - pstrike
+            sentinel = strike.getlastmatched(straddle['strike'] + distance, callstrikes, callix)
+            if sentinel >= 0:
+                callix = sentinel
+                callprice = dgb.getoptprice(opts, 'call', callstrikes[callix], exp)
+                putprice = dgb.getoptprice(opts, 'put', pstrike, exp)
+                farprice = callprice + putprice
+                credit = straddle['price'] - farprice
+                if credit <= 0.:
+                    return butterflies
+                risk = distance - credit
+                if risk < credit:
+                    butterflies.append({
+                        'straddle': straddle,
+                        'call': {'strike': callstrikes[callix], 'price': callprice},
+                        'put': {'strike': pstrike, 'price': putprice},
+                        'farexp': exp,
+                        'risk': risk,
+                        'credit': credit,
+                        'ratio': straddle['price'] / farprice,
+                        'underlying': opts.data.iloc[0, :].loc['Underlying'],
+                        'eqprice': opts.data.iloc[0].loc['Underlying_Price']
+                        })
+    return butterflies
+
+class TestBtfsForExp(unittest.TestCase):
+
+    def test_matches_loop(self):
+        rand = np.random.RandomState(0)
+        n_found = 0
+        for _ in range(300):
+            opts = _chain(rand)
+            straddle = {'exp': pd.Timestamp('2016-06-17'),
+                    'strike': float(rand.choice(opts.data.index.get_level_values(0))),
+                    'price': rand.uniform(2., 30.)}
+            expected = _btfsforexp_loop(opts, straddle, EXP)
+            actual = dgb._btfsforexp(opts, straddle, EXP)
+            self.assertEqual(len(actual), len(expected))
+            for btf, expected_btf in zip(actual, expected):
+                self.assertEqual(btf, expected_btf)
+            n_found += len(expected)
+        # enough spreads found for the comparison to mean something
+        self.assertGreater(n_found, 100)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -6,12 +6,22 @@ Backtest velocity-based trading strategy
 ========================================
 """
 
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import numpy as np
+import pandas as pd
 import pynance as pn
 
 import constants
 import velo
 
-def simulate(equities, start, end, window=100, investment=10000):
+# result fields accumulated across equities
+SUMMED_KEYS = ('Buy Count', 'Triggered Sell Count', 'Total Invested', 'Total Sales',
+        'Days at Risk',)
+REVERSAL_DTYPE = np.dtype([('Index', 'int64'), ('Action', 'U4'), ('Price', 'float64')])
+
+def simulate(equities, start, end, window=100, investment=10000, workers=1, store=None):
     """
     Run simulation
 
@@ -35,6 +45,16 @@ def simulate(equities, start, end, window=100, investment=10000):
     investment : float, optional
         Defaults to 10000.
 
+    workers : int, optional
+        Number of processes across which equities are simulated.
+        Partial results are always combined in the order of `equities`,
+        so the result does not depend on `workers`. Defaults to 1.
+
+    store : PriceStore, optional
+        Source of price history, such as a `pricestore.PriceStore`
+        from `common`. Defaults to retrieving data remotely
+        with `pn.data.get`.
+
     Notes
     -----
     Triggered Sell Count :
@@ -70,74 +90,243 @@ def simulate(equities, start, end, window=100, investment=10000):
             'Ave Yrly Return': 0.
             }
     pricecol = 'Adj Close'
-    for equity in equities:
-        print("Running simulation for equity '{}'".format(equity))
-        eqdata = pn.data.get(equity, start, end)
-        _sim_eq(eqdata, window, investment, pricecol, result)
+    run_eq = partial(_run_eq, start=start, end=end, window=window, investment=investment,
+            pricecol=pricecol, store=store)
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            eq_results = list(executor.map(run_eq, equities))
+    else:
+        eq_results = list(map(run_eq, equities))
+    _summarize(result, eq_results)
+    return result
+
+def sweep(universes, periods, windows, investments=(10000,), workers=1, store=None):
+    """
+    Run simulations for every combination of universe, period,
+    window and investment.
+
+    Prices for each equity are retrieved only once, covering
+    all periods, and velocity for each equity is calculated only
+    once per window.
+
+    Parameters
+    ----------
+    universes : dict
+        Maps a name for each universe to a list of equities.
+
+    periods : list of tuple
+        Each period is a tuple `(start, end)` of values accepted
+        as `start` and `end` by `simulate()`.
+
+    windows : list of int
+
+    investments : list of float, optional
+        Defaults to `(10000,)`.
+
+    workers : int, optional
+        Number of processes across which windows are distributed.
+        Defaults to 1.
+
+    store : PriceStore, optional
+        Source of price history, as for `simulate()`.
+
+    Returns
+    -------
+    results : DataFrame
+        One row per grid point with columns 'Universe', 'Start', 'End',
+        'Window', 'Investment' followed by the summary fields returned
+        by `simulate()`. Summary fields are NaN for a grid point
+        in which no investment was made.
+    """
+    pricecol = 'Adj Close'
+    periods = [(pd.Timestamp(start), pd.Timestamp(end),) for start, end in periods]
+    start = min(period[0] for period in periods)
+    end = max(period[1] for period in periods)
+    prices = {}
+    for equity in sorted(set(eq for equities in universes.values() for eq in equities)):
+        print("Retrieving data for equity '{}'".format(equity))
+        prices[equity] = _get_eqdata(equity, start, end, store).loc[:, [pricecol]]
+    grid = [(name, period, investment,) for name in universes for period in periods
+            for investment in investments]
+    sweep_window = partial(_sweep_window, prices=prices, universes=universes, grid=grid,
+            pricecol=pricecol)
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            window_rows = list(executor.map(sweep_window, windows))
+    else:
+        window_rows = list(map(sweep_window, windows))
+    columns = ['Universe', 'Start', 'End', 'Window', 'Investment', 'Buy Count',
+            'Triggered Sell Count', 'Total Invested', 'Total Sales', 'Total Profit',
+            'Days at Risk', 'Years at Risk', 'Ave Yrly Return']
+    return pd.DataFrame([row for rows in window_rows for row in rows], columns=columns)
+
+def _sweep_window(window, prices, universes, grid, pricecol):
+    print('Running simulations for window {}'.format(window))
+    veldata = {}
+    for equity in prices:
+        try:
+            veldata[equity] = velo.rolling_vel(prices[equity], window, pricecol)
+        except ValueError:
+            veldata[equity] = None
+    rows = []
+    for name, (start, end), investment in grid:
+        eq_results = []
+        for equity in universes[name]:
+            eq_vel = _slice_vel(prices[equity].index, veldata[equity], window, start, end)
+            if eq_vel is not None:
+                eq_results.append(_sim_vel(eq_vel, investment, pricecol, verbose=False))
+        result = {
+                'Universe': name,
+                'Start': start,
+                'End': end,
+                'Window': window,
+                'Investment': investment
+                }
+        result.update(_empty_result())
+        try:
+            _summarize(result, eq_results)
+        except ZeroDivisionError:
+            for key in ('Total Profit', 'Years at Risk', 'Ave Yrly Return',):
+                result[key] = float('nan')
+        rows.append(result)
+    return rows
+
+def _slice_vel(index, veldata, window, start, end):
+    """
+    Return the velocity data that `velo.rolling_vel()` would
+    produce for the prices between `start` and `end`, or None
+    if those prices are insufficient for `window`.
+    """
+    if veldata is None:
+        return None
+    startpos = index.searchsorted(start)
+    endpos = index.searchsorted(end, side='right')
+    if window + 1 >= endpos - startpos:
+        return None
+    # row i of `veldata` belongs to row i + window of `index`
+    return veldata.iloc[startpos:endpos - window]
+
+def _summarize(result, eq_results):
+    for eq_result in eq_results:
+        for key in SUMMED_KEYS:
+            result[key] += eq_result[key]
     result['Total Profit'] = result['Total Sales'] - result['Total Invested']
     result['Years at Risk'] = result['Days at Risk'] / 365.25
     total_ret = result['Total Profit'] / result['Total Invested']
     result['Ave Yrly Return'] = pn.interest.yrlyret(total_ret, result['Years at Risk'])
-    return result
 
-def _sim_eq(eqdata, window, investment, pricecol, result):
+def _run_eq(equity, start, end, window, investment, pricecol, store):
+    print("Running simulation for equity '{}'".format(equity))
+    eqdata = _get_eqdata(equity, start, end, store)
+    return _sim_eq(eqdata, window, investment, pricecol)
+
+def _get_eqdata(equity, start, end, store):
+    if store is None:
+        return pn.data.get(equity, start, end)
+    return store.get(equity, start, end)
+
+def _sim_eq(eqdata, window, investment, pricecol):
+    """
+    Return the contribution of a single equity to the summed
+    fields of the simulation result.
+    """
     try:
         veldata = velo.rolling_vel(eqdata, window, pricecol)
     except ValueError as e:
         print('ValueError: {}'.format(e))
-    else:
-        print("Valid equity data starts on {}".format(veldata.index[0]))
-        revs = reversals(veldata, pricecol)
-        invested = False
-        buyprice = 0.
-        sellprice = 0.
-        buydate = None
-        lastdate = None
-        days_at_risk = 0
-        for rev in revs:
-            if rev['Action'] == 'Buy':
-                invested = True
-                buyprice = rev['Price']
-                buydate = rev['Date']
-                result['Buy Count'] += 1
-                result['Total Invested'] += investment
-                continue
-            if invested and rev['Action'] == 'Sell':
-                invested = False
-                sellprice = rev['Price']
-                result['Triggered Sell Count'] += 1
-                result['Total Sales'] += investment * sellprice / buyprice
-                days_at_risk = (rev['Date'] - buydate).days
-                result['Days at Risk'] += days_at_risk
-        if invested:
+        return _empty_result()
+    print("Valid equity data starts on {}".format(veldata.index[0]))
+    return _sim_vel(veldata, investment, pricecol)
+
+def _sim_vel(veldata, investment, pricecol, verbose=True):
+    result = _empty_result()
+    revs = reversal_array(veldata, pricecol)
+    # a sale before the first purchase closes no position
+    if revs.shape[0] > 0 and revs['Action'][0] == 'Sell':
+        revs = revs[1:]
+    # purchases and sales alternate
+    buys = revs[0::2]
+    sells = revs[1::2]
+    n_buys = buys.shape[0]
+    n_sells = sells.shape[0]
+    if n_buys == 0:
+        return result
+    dates = veldata.index.values
+    sellprices = sells['Price']
+    sellix = sells['Index']
+    if n_buys > n_sells:
+        if verbose:
             print('Still invested at end of simulation. Selling')
-            lastdate = veldata.index[-1]
-            days_at_risk = (lastdate - buydate).days
-            result['Total Sales'] += investment * veldata.loc[lastdate, pricecol] / buyprice
-            result['Days at Risk'] += days_at_risk
+        sellprices = np.append(sellprices, veldata.loc[:, pricecol].values[-1])
+        sellix = np.append(sellix, dates.shape[0] - 1)
+    days_at_risk = (dates[sellix] - dates[buys['Index']]) // np.timedelta64(1, 'D')
+    result['Buy Count'] = n_buys
+    result['Triggered Sell Count'] = n_sells
+    result['Total Invested'] = float(investment * n_buys)
+    result['Total Sales'] = float(np.sum(investment * sellprices / buys['Price']))
+    result['Days at Risk'] = int(np.sum(days_at_risk))
+    return result
+
+def _empty_result():
+    return {
+            'Buy Count': 0,
+            'Triggered Sell Count': 0,
+            'Total Invested': 0.,
+            'Total Sales': 0.,
+            'Days at Risk': 0
+            }
 
 def reversals(vel_all, pricecol='Adj Close'):
-    bullish = True
+    """
+    Return a list of velocity crossovers, each represented
+    as a dict with keys 'Date', 'Action', 'Index' and 'Price'.
+
+    Cf. `reversal_array()`.
+    """
+    dates = vel_all.index
+    return [{'Date': dates[rev['Index']], 'Action': str(rev['Action']),
+        'Index': int(rev['Index']), 'Price': rev['Price']}
+        for rev in reversal_array(vel_all, pricecol)]
+
+def reversal_array(vel_all, pricecol='Adj Close'):
+    """
+    Return velocity crossovers as a structured array.
+
+    The initial trend is bullish unless the first session in which
+    upward and downward velocity differ shows downward velocity greater
+    than upward velocity. A 'Sell' is triggered when a bullish trend
+    sees downward velocity exceed upward velocity, a 'Buy' when a bearish
+    trend sees upward velocity exceed downward velocity. Sessions in
+    which the velocities are equal leave the trend unchanged.
+
+    Parameters
+    ----------
+    vel_all : DataFrame
+        Velocity data as returned by `velo.rolling_vel()`.
+
+    pricecol : str, optional
+        Defaults to 'Adj Close'.
+
+    Returns
+    -------
+    revs : ndarray
+        Array of dtype `REVERSAL_DTYPE` with fields 'Index' (row
+        of `vel_all`), 'Action' ('Buy' or 'Sell') and 'Price'.
+    """
     up = vel_all.loc[:, constants.UPVEL_COL].values
     down = vel_all.loc[:, constants.DOWNVEL_COL].values
     prices = vel_all.loc[:, pricecol].values
-    # Determine initial trend
-    for i in range(up.shape[0]):
-        if up[i] > down[i]:
-            break
-        if up[i] < down[i]:
-            bullish = False
-            break
-    revs = []
-    for i in range(up.shape[0]):
-        if bullish and up[i] < down[i]:
-            bullish = False
-            revs.append({'Date': vel_all.index[i], 'Action': 'Sell',
-                'Index': i, 'Price': prices[i]})
-            continue
-        if not bullish and up[i] > down[i]:
-            bullish = True
-            revs.append({'Date': vel_all.index[i], 'Action': 'Buy',
-                'Index': i, 'Price': prices[i]})
+    trend = np.sign(up - down)
+    trend[np.isnan(trend)] = 0.
+    changes = np.flatnonzero(trend)
+    initial = trend[changes[0]] if changes.shape[0] > 0 else 1.
+    # carry the prevailing trend forward over sessions without a signal
+    trend = np.concatenate(([initial], trend))
+    prevailing = np.where(trend != 0., np.arange(trend.shape[0]), 0)
+    trend = trend[np.maximum.accumulate(prevailing)]
+    ix = np.flatnonzero(trend[1:] != trend[:-1])
+    revs = np.empty(ix.shape[0], dtype=REVERSAL_DTYPE)
+    revs['Index'] = ix
+    revs['Action'] = np.where(trend[ix + 1] > 0., 'Buy', 'Sell')
+    revs['Price'] = prices[ix]
     return revs
-        
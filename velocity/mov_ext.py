@@ -6,6 +6,10 @@ Data structure for storing possible velocity extrema
 =================
 """
 
+from collections import deque
+
+import numpy as np
+
 class MovingExtremumFinder(object):
     """
     For maintaining a list of relevant indices for tracking a moving
@@ -66,8 +70,91 @@ class MovingExtremumFinder(object):
             if self._compfn(self._data[ix], self._data[self._indices[begin]]):
                 return begin
             return (begin + 1) % self._WINDOW
-        halflen = length / 2
+        halflen = length // 2
         middle = (begin + halflen) % self._WINDOW
         if self._compfn(self._data[ix], self._data[self._indices[middle]]):
             return self._rec_find(ix, begin, halflen)
         return self._rec_find(ix, (begin + halflen) % self._WINDOW, length - halflen)
+
+def sessions_since_extremum(data, window, compfn):
+    """
+    Return the number of sessions since the moving extremum for
+    every index of `data`.
+
+    The result is identical to calling `MovingExtremumFinder.insert()`
+    for each index in order, but candidates are kept in a monotonic
+    deque, so the whole array is processed in amortized O(n) time.
+
+    Parameters
+    ----------
+    data : ndarray
+        Array containing relevant price data
+
+    window : int
+        Size of the window.
+
+    compfn : Function
+        Function used to compare 2 data values, as for
+        `MovingExtremumFinder`.
+
+    Returns
+    -------
+    sessions : ndarray of int
+    """
+    values = np.asarray(data).tolist()
+    sessions = np.empty(len(values), dtype='int64')
+    candidates = deque()
+    for ix, value in enumerate(values):
+        if candidates and ix - candidates[0] > window:
+            candidates.popleft()
+        while candidates and compfn(value, values[candidates[-1]]):
+            candidates.pop()
+        candidates.append(ix)
+        sessions[ix] = ix - candidates[0]
+    return sessions
+
+def sessions_since_extremum_multi(data, windows, compfn):
+    """
+    Return the number of sessions since the moving extremum for
+    every index of `data` and every window in `windows`.
+
+    A single monotonic deque sized for the largest window is shared
+    by all windows: the extremum for a smaller window is the first
+    candidate still inside that window, found by binary search.
+
+    Parameters
+    ----------
+    data : ndarray
+        Array containing relevant price data
+
+    windows : sequence of int
+        Window sizes.
+
+    compfn : Function
+        Function used to compare 2 data values, as for
+        `MovingExtremumFinder`.
+
+    Returns
+    -------
+    sessions : ndarray of int
+        Array of shape (len(data), len(windows)).
+    """
+    values = np.asarray(data).tolist()
+    windows = np.asarray(windows, dtype='int64')
+    max_window = windows.max()
+    sessions = np.empty((len(values), windows.shape[0]), dtype='int64')
+    # indices in candidates[begin:end] are increasing, so the
+    # slice can be searched directly
+    candidates = np.empty(len(values), dtype='int64')
+    begin = 0
+    end = 0
+    for ix, value in enumerate(values):
+        if end > begin and ix - candidates[begin] > max_window:
+            begin += 1
+        while end > begin and compfn(value, values[candidates[end - 1]]):
+            end -= 1
+        candidates[end] = ix
+        end += 1
+        first = np.searchsorted(candidates[begin:end], ix - windows)
+        sessions[ix] = ix - candidates[begin + first]
+    return sessions
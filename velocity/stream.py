@@ -0,0 +1,140 @@
+"""
+.. Copyright (c) 2015 Marshall Farrier
+   license http://opensource.org/licenses/MIT
+
+Streaming velocity updates
+==========================
+"""
+
+import operator
+import pickle
+
+import constants
+from mov_ext import MovingExtremumFinder
+
+class VelocityStream(object):
+    """
+    Velocity and reversal signals for a price series that
+    grows by one session at a time.
+
+    Only the most recent `window + 1` prices are retained, so
+    a stream can be checkpointed with `save()` after each close and
+    restored with `load()` before the next session.
+
+    Usage
+    -----
+    stream = VelocityStream(100)
+    stream.warm(eqdata.loc[:, 'Adj Close'].values, eqdata.index)
+    stream.save('nflx.pkl')
+    ...
+    stream = VelocityStream.load('nflx.pkl')
+    update = stream.update(price, date)
+    """
+    def __init__(self, window=100):
+        """
+        Parameters
+        ----------
+        window : int, optional
+            The window of prior sessions over which
+            velocity is calculated. Defaults to 100.
+        """
+        self.window = window
+        self._prices = _PriceRing(window + 1)
+        self._up_finder = MovingExtremumFinder(self._prices, window, operator.gt)
+        self._down_finder = MovingExtremumFinder(self._prices, window, operator.lt)
+        self._n_sessions = 0
+        # None until upward and downward velocity first differ
+        self._bullish = None
+
+    def warm(self, prices, dates=None):
+        """
+        Feed historical prices into the stream.
+
+        Parameters
+        ----------
+        prices : sequence of float
+
+        dates : sequence, optional
+            Date for each price.
+
+        Returns
+        -------
+        update : dict or None
+            Result of `update()` for the last price.
+        """
+        if dates is None:
+            dates = [None] * len(prices)
+        update = None
+        for price, date in zip(prices, dates):
+            update = self.update(price, date)
+        return update
+
+    def update(self, price, date=None):
+        """
+        Add the price for a new session.
+
+        Parameters
+        ----------
+        price : float
+
+        date : optional
+            Date of the session, returned unchanged.
+
+        Returns
+        -------
+        update : dict or None
+            None until `window` sessions of prior history are available.
+            Otherwise a dict with keys 'Date', 'Price', `constants.UPVEL_COL`,
+            `constants.DOWNVEL_COL` and 'Action'. 'Action' is 'Buy' or 'Sell'
+            for a velocity crossover, as in `backtest.reversals()`, and
+            None otherwise.
+        """
+        ix = self._n_sessions
+        self._prices[ix] = price
+        up_sessions = self._up_finder.insert(ix)
+        down_sessions = self._down_finder.insert(ix)
+        self._n_sessions += 1
+        if ix < self.window:
+            return None
+        win_float = float(self.window)
+        upvel = float(self.window - up_sessions) / win_float
+        downvel = float(self.window - down_sessions) / win_float
+        return {'Date': date, 'Price': price, constants.UPVEL_COL: upvel,
+                constants.DOWNVEL_COL: downvel, 'Action': self._action(upvel, downvel)}
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            pickle.dump(self, f, pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+
+    def _action(self, upvel, downvel):
+        if self._bullish is None:
+            if upvel != downvel:
+                self._bullish = upvel > downvel
+            return None
+        if self._bullish and upvel < downvel:
+            self._bullish = False
+            return 'Sell'
+        if not self._bullish and upvel > downvel:
+            self._bullish = True
+            return 'Buy'
+        return None
+
+class _PriceRing(object):
+    """
+    Prices addressed by session index, of which only the
+    most recent `size` are retained.
+    """
+    def __init__(self, size):
+        self._size = size
+        self._values = [0.] * size
+
+    def __getitem__(self, ix):
+        return self._values[ix % self._size]
+
+    def __setitem__(self, ix, value):
+        self._values[ix % self._size] = value
@@ -0,0 +1,105 @@
+"""
+Unit tests for `backtest` module
+
+Copyright (c) 2015 Marshall Farrier
+license http://opensource.org/licenses/MIT
+"""
+
+import os
+import random
+import sys
+import unittest
+import zlib
+
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+import backtest
+import constants
+
+class _StubStore(object):
+    """
+    Deterministic random walk prices for any equity, in place of a
+    `pricestore.PriceStore`. Module level so that it can be pickled
+    for worker processes.
+    """
+    def get(self, equity, start, end):
+        rand = random.Random(zlib.crc32(equity.encode()))
+        index = pd.bdate_range('2010-01-01', '2013-12-31')
+        prices = [50.]
+        for _ in range(len(index) - 1):
+            prices.append(prices[-1] * (1. + rand.gauss(0., .02)))
+        eqdata = pd.DataFrame({'Adj Close': prices}, index=index)
+        return eqdata.loc[start:end]
+
+class TestSimulate(unittest.TestCase):
+
+    def setUp(self):
+        self.equities = ['AAA', 'BBB', 'CCC', 'DDD', 'EEE']
+        self.store = _StubStore()
+
+    def test_workers(self):
+        serial = backtest.simulate(self.equities, '2011-01-01', '2013-06-30', window=50,
+                store=self.store)
+        parallel = backtest.simulate(self.equities, '2011-01-01', '2013-06-30', window=50,
+                workers=2, store=self.store)
+        self.assertGreater(serial['Buy Count'], 0)
+        # bit-identical, not merely close
+        self.assertEqual(serial, parallel)
+
+class TestSweep(unittest.TestCase):
+
+    def test_matches_simulate(self):
+        store = _StubStore()
+        universes = {'small': ['AAA', 'BBB'], 'large': ['BBB', 'CCC', 'DDD', 'EEE']}
+        # periods starting at, after and before the first available price
+        periods = [('2010-01-01', '2011-12-31'), ('2011-03-15', '2013-06-30'),
+                ('2009-06-01', '2010-09-30')]
+        windows = [20, 50]
+        results = backtest.sweep(universes, periods, windows, investments=(10000, 5000),
+                store=store)
+        self.assertEqual(len(results), len(universes) * len(periods) * len(windows) * 2)
+        for _, row in results.iterrows():
+            expected = backtest.simulate(universes[row['Universe']], row['Start'], row['End'],
+                    window=row['Window'], investment=row['Investment'], store=store)
+            for key in ('Buy Count', 'Triggered Sell Count', 'Days at Risk',):
+                self.assertEqual(row[key], expected[key], key)
+            for key in ('Total Invested', 'Total Sales', 'Total Profit', 'Years at Risk',
+                    'Ave Yrly Return',):
+                self.assertAlmostEqual(row[key], expected[key], msg=key)
+
+class TestReversals(unittest.TestCase):
+
+    def setUp(self):
+        index = pd.date_range('2015-01-01', periods=8, freq='D')
+        self.veldata = pd.DataFrame({
+            'Adj Close': [10., 11., 12., 13., 14., 15., 16., 17.],
+            constants.UPVEL_COL: [.5, .3, .3, .6, .6, .2, .2, .9],
+            constants.DOWNVEL_COL: [.5, .5, .3, .3, .6, .6, .2, .1]
+            }, index=index)
+
+    def test_reversal_array(self):
+        revs = backtest.reversal_array(self.veldata)
+        # initially bearish, ties leave trend unchanged
+        self.assertEqual(revs['Index'].tolist(), [3, 5, 7])
+        self.assertEqual(revs['Action'].tolist(), ['Buy', 'Sell', 'Buy'])
+        self.assertEqual(revs['Price'].tolist(), [13., 15., 17.])
+
+    def test_reversals(self):
+        revs = backtest.reversals(self.veldata)
+        self.assertEqual(revs[0], {'Date': pd.Timestamp('2015-01-04'), 'Action': 'Buy',
+            'Index': 3, 'Price': 13.})
+        self.assertEqual(len(revs), 3)
+
+    def test_sim_vel(self):
+        self.veldata.iloc[6:, 1] = [.7, .9]
+        result = backtest._sim_vel(self.veldata, 1000., 'Adj Close', verbose=False)
+        # buy at 13 on day 3, sell at 15 on day 5, buy at 16 on day 6, cash out at 17
+        self.assertEqual(result['Buy Count'], 2)
+        self.assertEqual(result['Triggered Sell Count'], 1)
+        self.assertEqual(result['Total Invested'], 2000.)
+        self.assertAlmostEqual(result['Total Sales'], 1000. * 15. / 13. + 1000. * 17. / 16.)
+        self.assertEqual(result['Days at Risk'], 3)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -13,7 +13,7 @@ import unittest
 import numpy as np
 
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
-from mov_ext import MovingExtremumFinder
+from mov_ext import MovingExtremumFinder, sessions_since_extremum
 
 class TestMovingExtremumFinder(unittest.TestCase):
 
@@ -39,5 +39,24 @@ class TestMovingExtremumFinder(unittest.TestCase):
             actual[i] = high_finder.insert(i)
         self.assertEqual(expected, actual, 'incorrect velocity series')
 
+    def test_sessions_since_extremum(self):
+        window = 3
+        seq =       [1., .9, .8, .7, .6, .9, .6, .8, .5, .7, .6, .6, .5, .5, .4, .4, .4, .3, .2, .1]
+        expected =  [0,   1,  2,  3,  3,  0,  1,  2,  3,  2,  3,  2,  3,  3,  3,  3,  3,  3,  3,  3]
+        actual = sessions_since_extremum(np.array(seq), window, operator.gt)
+        self.assertEqual(expected, actual.tolist(), 'incorrect velocity series')
+
+    def test_sessions_since_extremum_matches_finder(self):
+        rng = np.random.RandomState(42)
+        # rounding produces ties
+        data = np.round(rng.randn(500).cumsum(), 0)
+        for window in (1, 2, 5, 20):
+            for compfn in (operator.gt, operator.lt):
+                finder = MovingExtremumFinder(data, window, compfn)
+                expected = [finder.insert(i) for i in range(data.shape[0])]
+                actual = sessions_since_extremum(data, window, compfn)
+                self.assertEqual(expected, actual.tolist(),
+                        'mismatch for window {}'.format(window))
+
 if __name__ == '__main__':
     unittest.main()
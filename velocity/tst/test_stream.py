@@ -0,0 +1,61 @@
+"""
+Unit tests for `VelocityStream` class
+
+Copyright (c) 2015 Marshall Farrier
+license http://opensource.org/licenses/MIT
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+import backtest
+import constants
+import velo
+from stream import VelocityStream
+
+class TestVelocityStream(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.RandomState(5)
+        index = pd.date_range('2012-01-01', periods=250, freq='B')
+        self.eqdata = pd.DataFrame({'Adj Close': 50. + np.round(rng.randn(250).cumsum(), 1)},
+                index=index)
+        self.prices = self.eqdata.loc[:, 'Adj Close'].values
+        self.window = 20
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_matches_rolling_vel(self):
+        veldata = velo.rolling_vel(self.eqdata, self.window)
+        revs = {rev['Date']: rev['Action'] for rev in backtest.reversals(veldata)}
+        stream = VelocityStream(self.window)
+        for i, date in enumerate(self.eqdata.index):
+            update = stream.update(self.prices[i], date)
+            if i < self.window:
+                self.assertIsNone(update)
+                continue
+            self.assertEqual(update[constants.UPVEL_COL], veldata.loc[date, constants.UPVEL_COL])
+            self.assertEqual(update[constants.DOWNVEL_COL], veldata.loc[date, constants.DOWNVEL_COL])
+            self.assertEqual(update['Action'], revs.get(date))
+
+    def test_checkpoint(self):
+        path = os.path.join(self.tmpdir, 'stream.pkl')
+        stream = VelocityStream(self.window)
+        stream.warm(self.prices[:200], self.eqdata.index[:200])
+        stream.save(path)
+        expected = [stream.update(price) for price in self.prices[200:]]
+        restored = VelocityStream.load(path)
+        actual = [restored.update(price) for price in self.prices[200:]]
+        self.assertEqual(expected, actual)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+"""
+Unit tests for `velo` module
+
+Copyright (c) 2015 Marshall Farrier
+license http://opensource.org/licenses/MIT
+"""
+
+import os
+import sys
+import unittest
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+import constants
+import velo
+
+class TestRollingVel(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.RandomState(7)
+        index = pd.date_range('2010-01-01', periods=300, freq='B')
+        self.eqdata = pd.DataFrame({'Adj Close': 50. + np.round(rng.randn(300).cumsum(), 1)},
+                index=index)
+
+    def test_engines_match(self):
+        for window in (5, 30):
+            expected = velo.rolling_vel(self.eqdata, window, engine='finder')
+            actual = velo.rolling_vel(self.eqdata, window, engine='deque')
+            pd.testing.assert_frame_equal(expected, actual)
+
+    def test_unknown_engine(self):
+        with self.assertRaises(ValueError):
+            velo.rolling_vel(self.eqdata, 5, engine='bogus')
+
+class TestRollingVelMulti(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.RandomState(11)
+        index = pd.date_range('2010-01-01', periods=300, freq='B')
+        self.eqdata = pd.DataFrame({'Adj Close': 50. + np.round(rng.randn(300).cumsum(), 1)},
+                index=index)
+
+    def test_matches_single_window(self):
+        windows = [20, 5, 60]
+        multi = velo.rolling_vel_multi(self.eqdata, windows)
+        self.assertEqual(multi.shape, (295, 6))
+        for window in windows:
+            single = velo.rolling_vel(self.eqdata, window)
+            for col in (constants.UPVEL_COL, constants.DOWNVEL_COL):
+                actual = multi.loc[single.index, (window, col)].values
+                np.testing.assert_array_equal(single.loc[:, col].values, actual)
+            self.assertTrue(multi.loc[:, window].iloc[:window - 5].isnull().all().all())
+
+    def test_insufficient_data(self):
+        with self.assertRaises(ValueError):
+            velo.rolling_vel_multi(self.eqdata, [10, 299])
+
+class TestPanelVel(unittest.TestCase):
+
+    def test_matches_rolling_vel(self):
+        rng = np.random.RandomState(3)
+        index = pd.date_range('2010-01-01', periods=200, freq='B')
+        prices = pd.DataFrame(50. + np.round(rng.randn(200, 3).cumsum(axis=0), 1),
+                index=index, columns=['AAA', 'BBB', 'CCC'])
+        # ragged start and a gap
+        prices.iloc[:40, 1] = np.nan
+        prices.iloc[150, 2] = np.nan
+        window = 20
+        upvel, downvel = velo.panel_vel(prices, window)
+        self.assertEqual(upvel.shape, (180, 3))
+        for equity in ('AAA', 'BBB'):
+            expected = velo.rolling_vel(prices.loc[:, [equity]].dropna(), window, equity)
+            np.testing.assert_array_equal(expected.loc[:, constants.UPVEL_COL].values,
+                    upvel.loc[:, equity].dropna().values)
+            np.testing.assert_array_equal(expected.loc[:, constants.DOWNVEL_COL].values,
+                    downvel.loc[:, equity].dropna().values)
+        self.assertEqual(upvel.loc[:, 'BBB'].first_valid_index(), index[40 + window])
+        self.assertEqual(int(upvel.loc[:, 'CCC'].isnull().sum()), window + 1)
+
+if __name__ == '__main__':
+    unittest.main()
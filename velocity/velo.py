@@ -13,9 +13,13 @@ import pandas as pd
 import pynance as pn
 
 import constants
-from mov_ext import MovingExtremumFinder
+from mov_ext import MovingExtremumFinder, sessions_since_extremum, sessions_since_extremum_multi
 
-def rolling_vel(eqdata, window=100, selection='Adj Close'):
+ENGINES = ('deque', 'finder',)
+# upper bound on array elements materialized at once by `panel_vel()`
+PANEL_CHUNK_SIZE = 2 ** 22
+
+def rolling_vel(eqdata, window=100, selection='Adj Close', engine='deque'):
     """
     Return a dataframe with prices and both upward and downward 
     velocity data.
@@ -32,6 +36,12 @@ def rolling_vel(eqdata, window=100, selection='Adj Close'):
     selection : str, optional
         Column of `eqdata` in which historical prices
         are specified. Defaults to 'Adj Close'.
+
+    engine : str, optional
+        Algorithm used to find the moving extrema. 'deque' processes
+        the whole array in a single amortized O(n) pass. 'finder' inserts
+        one index at a time into a `MovingExtremumFinder`. Both
+        return identical results. Defaults to 'deque'.
         
     Returns
     -------
@@ -39,18 +49,154 @@ def rolling_vel(eqdata, window=100, selection='Adj Close'):
     """
     if window + 1 >= eqdata.index.shape[0]:
         raise ValueError('insufficient data for given window')
+    if engine not in ENGINES:
+        raise ValueError("unknown engine '{}'".format(engine))
     outix = eqdata.index[window:]
     upcol = constants.UPVEL_COL
     downcol = constants.DOWNVEL_COL
     mov_vel = pd.DataFrame(index=eqdata.index[window:], 
             columns=[selection, upcol, downcol], dtype='float64')
     mov_vel.loc[:, selection] = eqdata.loc[:, selection].values[window:]
-    mov_vel.loc[:, upcol] = _velocity(eqdata, window, selection, operator.gt, upcol)
-    mov_vel.loc[:, downcol] = _velocity(eqdata, window, selection, operator.lt, downcol)
+    mov_vel.loc[:, upcol] = _velocity(eqdata, window, selection, operator.gt, upcol, engine)
+    mov_vel.loc[:, downcol] = _velocity(eqdata, window, selection, operator.lt, downcol, engine)
     return mov_vel
 
-def _velocity(eqdata, window, selection, compfn, outputcol):
+def rolling_vel_values(prices, window=100):
+    """
+    Return upward and downward velocity for an array of prices.
+
+    Parameters
+    ----------
+    prices : ndarray
+        Price data, such as a view returned by
+        `CloseStore.valid()` in `common/closestore.py`.
+
+    window : int, optional
+        The window of prior sessions over which
+        velocity is calculated. Defaults to 100.
+
+    Returns
+    -------
+    upvel : ndarray
+
+    downvel : ndarray
+        Velocity for each session after the first `window`,
+        as in `rolling_vel()`.
+    """
+    if window + 1 >= prices.shape[0]:
+        raise ValueError('insufficient data for given window')
+    return (_vel_values(prices, window, operator.gt), _vel_values(prices, window, operator.lt),)
+
+def rolling_vel_multi(eqdata, windows, selection='Adj Close'):
+    """
+    Return upward and downward velocity for several windows,
+    computed in a single pass over the price data.
+
+    Parameters
+    ----------
+    eqdata : DataFrame
+        Source data
+
+    windows : sequence of int
+        Windows of prior sessions over which velocity is calculated.
+
+    selection : str, optional
+        Column of `eqdata` in which historical prices
+        are specified. Defaults to 'Adj Close'.
+
+    Returns
+    -------
+    mov_vel : DataFrame
+        Indexed by date starting after the smallest window, with
+        columns `(window, constants.UPVEL_COL)` and
+        `(window, constants.DOWNVEL_COL)` for each window. Values
+        for a given window match those returned by `rolling_vel()`
+        and are NaN where there is insufficient history for that window.
+        `mov_vel.values.reshape(-1, len(windows), 2)` yields
+        a (dates x windows x {up, down}) block.
+    """
+    windows = [int(window) for window in windows]
+    if not windows:
+        raise ValueError('at least one window is required')
+    if min(windows) < 1:
+        raise ValueError('windows must be positive')
+    if max(windows) + 1 >= eqdata.index.shape[0]:
+        raise ValueError('insufficient data for given window')
+    min_window = min(windows)
     inputdata = eqdata.loc[:, selection].values
+    win_arr = np.array(windows, dtype='float64')
+    block = np.empty((inputdata.shape[0] - min_window, len(windows), 2), dtype='float64')
+    for i, compfn in enumerate((operator.gt, operator.lt)):
+        sessions = sessions_since_extremum_multi(inputdata, windows, compfn)[min_window:]
+        block[:, :, i] = (win_arr - sessions) / win_arr
+    # no velocity before a full window of history is available
+    for j, window in enumerate(windows):
+        block[:window - min_window, j, :] = np.nan
+    columns = pd.MultiIndex.from_product([windows, [constants.UPVEL_COL, constants.DOWNVEL_COL]])
+    return pd.DataFrame(block.reshape(block.shape[0], -1), index=eqdata.index[min_window:],
+            columns=columns)
+
+def panel_vel(prices, window=100):
+    """
+    Return upward and downward velocity for a panel of equities.
+
+    Velocity is computed for all equities at once from a strided view
+    of the price matrix. Equities may start trading on different dates:
+    a velocity is only reported once `window` sessions of prior history
+    are available, and any window containing a missing price yields NaN.
+
+    Parameters
+    ----------
+    prices : DataFrame
+        Date-aligned prices with dates as index and one
+        column per equity. Missing prices are NaN.
+
+    window : int, optional
+        The window of prior sessions over which
+        velocity is calculated. Defaults to 100.
+
+    Returns
+    -------
+    upvel : DataFrame
+
+    downvel : DataFrame
+        Both indexed by date starting after the first `window` sessions
+        and with the same columns as `prices`. For each column, values
+        match those returned by `rolling_vel()` on that equity's data.
+    """
+    if window + 1 >= prices.index.shape[0]:
+        raise ValueError('insufficient data for given window')
+    values = prices.values.astype('float64')
+    missing = np.isnan(values)
+    n_missing = np.concatenate((np.zeros((1, values.shape[1]), dtype='int64'),
+            missing.cumsum(axis=0)))
+    # number of missing prices in window ending at each output row
+    invalid = (n_missing[window + 1:] - n_missing[:-window - 1]) > 0
+    upvel = _panel_velocity(np.where(missing, -np.inf, values), window, np.argmax)
+    downvel = _panel_velocity(np.where(missing, np.inf, values), window, np.argmin)
+    upvel[invalid] = np.nan
+    downvel[invalid] = np.nan
+    outix = prices.index[window:]
+    return (pd.DataFrame(upvel, index=outix, columns=prices.columns),
+            pd.DataFrame(downvel, index=outix, columns=prices.columns),)
+
+def _panel_velocity(values, window, argfn):
+    n_out = values.shape[0] - window
+    vels = np.empty((n_out, values.shape[1]), dtype='float64')
+    chunk = max(1, PANEL_CHUNK_SIZE // (values.shape[1] * (window + 1)))
+    for begin in range(0, n_out, chunk):
+        end = min(begin + chunk, n_out)
+        # shape (rows, equities, window + 1) with today as last element
+        windows = np.lib.stride_tricks.sliding_window_view(values[begin:end + window],
+                window + 1, axis=0)
+        # first occurrence of the extremum, as for `MovingExtremumFinder`
+        vels[begin:end] = argfn(windows, axis=2)
+    return vels / float(window)
+
+def _velocity(eqdata, window, selection, compfn, outputcol, engine='deque'):
+    inputdata = eqdata.loc[:, selection].values
+    if engine == 'deque':
+        return _vel_values(inputdata, window, compfn)
     vels = np.empty_like(eqdata.index[window:], dtype='float64')
     ext_finder = MovingExtremumFinder(inputdata, window, compfn)
     win_float = float(window)
@@ -60,3 +206,7 @@ def _velocity(eqdata, window, selection, compfn, outputcol):
     for i in range(window, inputdata.shape[0]):
         vels[i - window] = float(window - ext_finder.insert(i)) / win_float
     return vels
+
+def _vel_values(prices, window, compfn):
+    sessions = sessions_since_extremum(prices, window, compfn)[window:]
+    return (window - sessions).astype('float64') / float(window)